@@ -0,0 +1,76 @@
+"""
+Compare two benchmark result files (see benchmarks.run).
+
+    python -m benchmarks.compare benchmarks/results/<base>.json benchmarks/results/<head>.json [--threshold 0.10]
+
+Prints p50/p95/p99, throughput and peak RSS side by side for every
+scenario present in both runs. A scenario regresses when its p95 or peak
+RSS grows, or its throughput drops, by more than threshold, or when it
+errors more often than before. The exit status is 1 if any scenario
+regressed, so this can gate CI.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(base: float, head: float) -> float:
+    return (head - base) / base if base else 0.0
+
+
+def compare(base: dict, head: dict, threshold: float) -> tuple:
+    rows, regressions = [], []
+    for name in sorted(set(base["results"]) & set(head["results"])):
+        old, new = base["results"][name], head["results"][name]
+        if "latency_ms" not in old or "latency_ms" not in new:
+            rows.append((name, "skipped or failed in one run"))
+            continue
+        deltas = {
+            "p50": change(old["latency_ms"]["p50"], new["latency_ms"]["p50"]),
+            "p95": change(old["latency_ms"]["p95"], new["latency_ms"]["p95"]),
+            "p99": change(old["latency_ms"]["p99"], new["latency_ms"]["p99"]),
+            "rps": change(old["throughput_rps"], new["throughput_rps"]),
+            "rss": change(old["memory_mb"]["peak_rss"], new["memory_mb"]["peak_rss"]),
+        }
+        regressed = deltas["p95"] > threshold or deltas["rss"] > threshold or deltas["rps"] < -threshold
+        if new["errors"] > old["errors"]:
+            regressed = True
+        if regressed:
+            regressions.append(name)
+        rows.append((name, (
+            f"p50 {new['latency_ms']['p50']:>9.1f}ms ({deltas['p50']:+.0%})  "
+            f"p95 {new['latency_ms']['p95']:>9.1f}ms ({deltas['p95']:+.0%})  "
+            f"p99 {new['latency_ms']['p99']:>9.1f}ms ({deltas['p99']:+.0%})  "
+            f"{new['throughput_rps']:>9.1f} req/s ({deltas['rps']:+.0%})  "
+            f"peak {new['memory_mb']['peak_rss']:>6.0f}MB ({deltas['rss']:+.0%})"
+            + ("  REGRESSED" if regressed else "")
+        )))
+    return rows, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative change (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    print(f"base {base['meta'].get('commit')}  ->  head {head['meta'].get('commit')}")
+    if base["meta"].get("args") != head["meta"].get("args"):
+        print("warning: runs used different arguments; numbers may not be comparable")
+    rows, regressions = compare(base, head, args.threshold)
+    for name, text in rows:
+        print(f"{name:<45} {text}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Generated fixture files for the model-backed benchmarks.
+
+K-1 scans are rendered deterministically (seeded), as PNG pages and as
+an image-only PDF like a scanner produces, so every run OCRs identical
+input. Face images come from --face-dir when given (real photos give
+representative detect/embed timings); otherwise simple synthetic faces
+are drawn, which exercise download, decode and detection but may not
+yield a detected face.
+"""
+import glob
+import os
+import random
+import shutil
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Letter size at 200 DPI, the K1Parser default rasterization
+PAGE_SIZE = (1700, 2200)
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1: fixed-size bitmap font only
+        return ImageFont.load_default()
+
+
+def k1_page(seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    page = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    title, body = _font(44), _font(30)
+
+    draw.text((120, 100), "Schedule K-1 (Form 1065)", font=title, fill=0)
+    draw.text((120, 170), "Partner's Share of Income, Deductions, Credits, etc.", font=body, fill=0)
+    draw.line((100, 230, PAGE_SIZE[0] - 100, 230), fill=0, width=3)
+
+    lines = [
+        f"Partnership's employer identification number {rng.randint(10, 99)}-{rng.randint(1000000, 9999999)}",
+        f"Partner's name: {rng.choice(['Jordan', 'Avery', 'Morgan', 'Riley'])} {rng.choice(['Lee', 'Patel', 'Garcia', 'Kim'])}",
+        f"1 Ordinary business income (loss) {rng.randint(1000, 250000):,}",
+        f"2 Net rental real estate income (loss) {rng.randint(0, 50000):,}",
+        f"13 Other deductions {rng.randint(100, 20000):,}",
+        f"15 Credits {rng.randint(0, 5000):,}",
+        f"19 Distributions {rng.randint(0, 100000):,}",
+    ]
+    y = 290
+    for line in lines:
+        draw.text((140, y), line, font=body, fill=0)
+        y += 90
+        # Form rules between fields, which the line segmenter has to ignore
+        draw.line((120, y - 25, PAGE_SIZE[0] - 120, y - 25), fill=96, width=2)
+
+    # Light scanner noise
+    pixels = page.load()
+    for _ in range(4000):
+        pixels[rng.randrange(PAGE_SIZE[0]), rng.randrange(PAGE_SIZE[1])] = rng.randint(150, 230)
+    return page.convert("RGB")
+
+
+def synthetic_face(seed: int, size: int = 480) -> Image.Image:
+    rng = random.Random(seed)
+    skin = (rng.randint(150, 235), rng.randint(110, 190), rng.randint(90, 160))
+    image = Image.new("RGB", (size, size), (rng.randint(180, 255),) * 3)
+    draw = ImageDraw.Draw(image)
+    cx, cy, rx, ry = size // 2, size // 2, size // 4, size // 3
+    draw.ellipse((cx - rx, cy - ry, cx + rx, cy + ry), fill=skin)
+    for dx in (-rx // 2, rx // 2):
+        draw.ellipse((cx + dx - 18, cy - ry // 4 - 10, cx + dx + 18, cy - ry // 4 + 10), fill=(250, 250, 250))
+        draw.ellipse((cx + dx - 8, cy - ry // 4 - 8, cx + dx + 8, cy - ry // 4 + 8), fill=(40, 30, 20))
+    draw.polygon([(cx, cy - 10), (cx - 14, cy + 40), (cx + 14, cy + 40)], fill=tuple(c - 30 for c in skin))
+    draw.arc((cx - 50, cy + 40, cx + 50, cy + 100), 20, 160, fill=(120, 40, 40), width=6)
+    return image
+
+
+def build(directory: str, k1_pages: int = 4, pdf_pages: int = 4, faces: int = 8, face_dir: str = None) -> dict:
+    """
+    Write fixtures into directory and return their file names:
+    {"k1_pages": [...png], "k1_pdf": "k1_scan.pdf", "faces": [...]}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    pages = [k1_page(seed) for seed in range(k1_pages)]
+    page_names = []
+    for i, page in enumerate(pages):
+        name = f"k1_{i}.png"
+        page.save(os.path.join(directory, name))
+        page_names.append(name)
+    pdf = pages[:pdf_pages]
+    pdf[0].save(os.path.join(directory, "k1_scan.pdf"), save_all=True, append_images=pdf[1:], resolution=200)
+
+    face_names = []
+    real = sorted(glob.glob(os.path.join(face_dir, "*.jp*g")) + glob.glob(os.path.join(face_dir, "*.png"))) if face_dir else []
+    for i in range(faces):
+        if real:
+            source = real[i % len(real)]
+            name = f"face_{i}{os.path.splitext(source)[1].lower()}"
+            shutil.copyfile(source, os.path.join(directory, name))
+        else:
+            name = f"face_{i}.jpg"
+            synthetic_face(i).save(os.path.join(directory, name), quality=90)
+        face_names.append(name)
+
+    return {"k1_pages": page_names, "k1_pdf": "k1_scan.pdf", "faces": face_names, "real_faces": bool(real)}
@@ -0,0 +1,100 @@
+"""
+Load generation and measurement for the benchmark scenarios.
+
+measure() drives an async call at a fixed concurrency and reports
+throughput, latency percentiles and the process's peak RSS while the
+scenario ran (sampled from a background thread).
+"""
+import asyncio
+import math
+import threading
+import time
+
+from services.metrics import rss_mb
+
+
+class PeakRSS:
+    """Samples resident memory every interval while active; .peak_mb is the maximum seen."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_mb = 0.0
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = rss_mb()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, rss_mb())
+        return False
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, rss_mb())
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def measure(call, requests: int, concurrency: int, warmup: int = 0) -> dict:
+    """
+    Run call(i) for i in range(requests), at most `concurrency` at once.
+    call returns truthy on success; a falsy return or an exception counts as an error.
+    """
+    for i in range(warmup):
+        await call(-1 - i)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                error = None if await call(i) else "call reported failure"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            latencies.append(time.perf_counter() - started)
+            if error:
+                errors.append(error)
+
+    with PeakRSS() as memory:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "memory_mb": {
+            "start_rss": round(memory.start_mb, 1),
+            "peak_rss": round(memory.peak_mb, 1),
+            "growth": round(memory.peak_mb - memory.start_mb, 1),
+        },
+    }
@@ -0,0 +1,473 @@
+"""
+Offline benchmark suite for the backend.
+
+Everything runs locally. Vertex AI is the stub model (VERTEX_STUB) with
+--vertex-latency-ms of simulated latency. Target sites are a FixtureSite
+on 127.0.0.1. Face images and K-1 scans are generated fixtures. Endpoints
+go through the Quart test client with the app's real startup and
+shutdown hooks; services are called directly.
+
+For every scenario the suite records throughput, p50/p95/p99 latency,
+peak RSS and the per-stage timings from services.metrics. Results are
+written as JSON named after the current commit, so two runs can be
+diffed with benchmarks.compare:
+
+    cd backend
+    python -m benchmarks.run                          # everything available
+    python -m benchmarks.run --only api/ai --requests 500
+    python -m benchmarks.run --face-dir ~/faces       # real photos for FaceVerifier
+    python -m benchmarks.compare benchmarks/results/abc.json benchmarks/results/def.json
+
+A scenario whose dependencies are not installed (torch, playwright,
+quart) is recorded as skipped, with the reason, instead of failing the run.
+"""
+import argparse
+import asyncio
+import fnmatch
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = []
+
+
+def scenario(name: str, kind: str, requires=(), model: bool = False):
+    """Register a scenario factory: async factory(ctx) -> async call(i) -> truthy on success."""
+    def register(factory):
+        SCENARIOS.append({"name": name, "kind": kind, "requires": requires, "model": model, "factory": factory})
+        return factory
+    return register
+
+
+class Context:
+    def __init__(self, args, site, files: dict, workdir: str):
+        self.args = args
+        self.site = site
+        self.files = files
+        self.workdir = workdir
+        self.cleanups = []
+        self._app = None
+        self._client = None
+
+    async def client(self):
+        """Quart test client for main:app, with startup/shutdown hooks run once for the whole suite."""
+        if self._client is None:
+            import main
+
+            self._app = main.app.test_app()
+            await self._app.__aenter__()
+            self._client = self._app.test_client()
+        return self._client
+
+    async def close(self) -> None:
+        for cleanup in reversed(self.cleanups):
+            await cleanup()
+        if self._app is not None:
+            await self._app.__aexit__(None, None, None)
+
+
+# ============================================
+# SERVICE SCENARIOS
+# ============================================
+
+@scenario("service/vertex.agenerate", "service")
+async def vertex_generate(ctx):
+    from services.vertex_client import get_vertex_client
+
+    client = get_vertex_client("benchmark")
+    return lambda i: client.agenerate(f"User query: question {i}")
+
+
+@scenario("service/url_fetcher.fetch[http]", "service", requires=("httpx",))
+async def fetch_http(ctx):
+    from services.url_fetcher import URLFetcher
+
+    fetcher = URLFetcher()
+    ctx.cleanups.append(fetcher.aclose)
+
+    async def call(i):
+        return (await fetcher.fetch(ctx.site.url(f"/biz/{i % ctx.args.businesses}.html"), use_js=False))["status"] == 200
+    return call
+
+
+@scenario("service/url_fetcher.fetch[revalidate]", "service", requires=("httpx",))
+async def fetch_revalidate(ctx):
+    from services.response_cache import ResponseCache
+    from services.url_fetcher import URLFetcher
+
+    # ttl 0: every hit is stale, so each fetch is a conditional GET answered 304
+    fetcher = URLFetcher(cache=ResponseCache(os.path.join(ctx.workdir, "response-cache"), default_ttl=0))
+    ctx.cleanups.append(fetcher.aclose)
+    await fetcher.fetch(ctx.site.url("/biz/0.html"), use_js=False)
+
+    async def call(i):
+        return (await fetcher.fetch(ctx.site.url("/biz/0.html"), use_js=False))["status"] == 200
+    return call
+
+
+@scenario("service/url_fetcher.fetch[playwright]", "service", requires=("httpx", "playwright"), model=True)
+async def fetch_playwright(ctx):
+    from services.url_fetcher import URLFetcher
+
+    # /js/ pages refuse non-browser clients, so every fetch falls back to the browser pool
+    fetcher = URLFetcher(max_retries=0)
+    ctx.cleanups.append(fetcher.browser_pool.close)
+    ctx.cleanups.append(fetcher.aclose)
+
+    async def call(i):
+        result = await fetcher.fetch(ctx.site.url(f"/js/{i}.html"), use_js=True)
+        return result["status"] == 200 and result["method"] == "playwright"
+    return call
+
+
+@scenario("service/url_fetcher.fetch_extract", "service", requires=("httpx",))
+async def fetch_extract(ctx):
+    from services.url_fetcher import URLFetcher
+
+    fetcher = URLFetcher()
+    ctx.cleanups.append(fetcher.aclose)
+
+    async def call(i):
+        result = await fetcher.fetch_extract(ctx.site.url(f"/biz/{i % ctx.args.businesses}.html"))
+        return result["status"] == 200 and result["phones"]
+    return call
+
+
+@scenario("service/url_fetcher.fetch_many[50]", "service", requires=("httpx",))
+async def fetch_many(ctx):
+    from services.url_fetcher import URLFetcher
+
+    fetcher = URLFetcher()
+    ctx.cleanups.append(fetcher.aclose)
+
+    async def call(i):
+        urls = [ctx.site.url(f"/biz/{n % ctx.args.businesses}.html?batch={i}") for n in range(50)]
+        results = [result async for result in fetcher.fetch_many(urls, extract=True)]
+        return all(result["status"] == 200 for result in results)
+    return call
+
+
+@scenario("service/harvester.run", "service", requires=("httpx",), model=True)
+async def harvest(ctx):
+    from services.harvester import HarvestEngine
+
+    engine = HarvestEngine(os.path.join(ctx.workdir, "harvest"), max_pages=ctx.args.businesses + 1)
+
+    async def call(i):
+        job = await asyncio.to_thread(
+            engine.prepare, f"Bench {i}", "TX", "Plumbing", [ctx.site.url("/directory.html")]
+        )
+        summary = await engine.run(job["job_id"], job.get("lease"))
+        return summary["status"] == "completed" and summary["leads"] == ctx.args.businesses
+    return call
+
+
+@scenario("service/face.verify_face", "service", requires=("torch", "facenet_pytorch", "httpx"), model=True)
+async def face_verify(ctx):
+    from services.embedding_cache import EmbeddingCache
+    from services.face_verifier import FaceVerifier
+
+    # No embedding cache: every request pays detection and the forward pass
+    verifier = await asyncio.to_thread(FaceVerifier, cache=EmbeddingCache(max_entries=0))
+    ctx.cleanups.append(verifier.downloader.aclose)
+    faces = ctx.files["faces"]
+
+    async def call(i):
+        result = await verifier.verify_face(
+            ctx.site.url(f"/files/{faces[i % len(faces)]}"), ctx.site.url(f"/files/{faces[(i + 1) % len(faces)]}")
+        )
+        if result["status"] != "success":
+            raise RuntimeError(result["message"])
+        return True
+    return call
+
+
+async def _k1_parser(ctx, cache_name: str):
+    from services.k1_parser import K1Parser
+    from services.ocr_cache import OcrCache
+
+    parser = await asyncio.to_thread(K1Parser, cache=OcrCache(os.path.join(ctx.workdir, cache_name)))
+    ctx.cleanups.append(parser.downloader.aclose)
+    return parser
+
+
+@scenario("service/k1.parse_k1", "service", requires=("torch", "transformers", "httpx"), model=True)
+async def k1_parse(ctx):
+    parser = await _k1_parser(ctx, "ocr-cold.sqlite")
+    pages = ctx.files["k1_pages"]
+
+    async def call(i):
+        result = await parser.parse_k1(ctx.site.url(f"/files/{pages[i % len(pages)]}"))
+        if result["status"] != "success":
+            raise RuntimeError(result["message"])
+        return True
+    return call
+
+
+@scenario("service/k1.parse_k1[cached]", "service", requires=("torch", "transformers", "httpx"), model=True)
+async def k1_parse_cached(ctx):
+    parser = await _k1_parser(ctx, "ocr-warm.sqlite")
+    url = ctx.site.url(f"/files/{ctx.files['k1_pages'][0]}")
+    await parser.parse_k1(url)
+
+    async def call(i):
+        result = await parser.parse_k1(url)
+        return result["status"] == "success" and result["cached"]
+    return call
+
+
+@scenario("service/k1.parse_pdf", "service", requires=("torch", "transformers", "pypdfium2"), model=True)
+async def k1_parse_pdf(ctx):
+    parser = await _k1_parser(ctx, "ocr-pdf.sqlite")
+    path = os.path.join(ctx.workdir, "fixtures", ctx.files["k1_pdf"])
+
+    async def call(i):
+        pages = [page async for page in parser.parse_pdf(path)]
+        return pages and all(page["status"] == "success" for page in pages)
+    return call
+
+
+# ============================================
+# ENDPOINT SCENARIOS
+# ============================================
+
+ENDPOINT_REQUIRES = ("quart", "quart_cors", "httpx")
+
+
+@scenario("endpoint/GET /health", "endpoint", requires=ENDPOINT_REQUIRES)
+async def health(ctx):
+    client = await ctx.client()
+
+    async def call(i):
+        return (await client.get("/health")).status_code == 200
+    return call
+
+
+@scenario("endpoint/GET /metrics", "endpoint", requires=ENDPOINT_REQUIRES)
+async def metrics_route(ctx):
+    client = await ctx.client()
+
+    async def call(i):
+        return (await client.get("/metrics")).status_code == 200
+    return call
+
+
+@scenario("endpoint/POST /api/ai/chat", "endpoint", requires=ENDPOINT_REQUIRES)
+async def chat(ctx):
+    client = await ctx.client()
+
+    async def call(i):
+        response = await client.post("/api/ai/chat", json={"message": f"Find a plumber, request {i}"})
+        return response.status_code == 200 and (await response.get_json())["model"] == "stub"
+    return call
+
+
+@scenario("endpoint/POST /api/ai/chat[cached]", "endpoint", requires=ENDPOINT_REQUIRES)
+async def chat_cached(ctx):
+    client = await ctx.client()
+    await client.post("/api/ai/chat", json={"message": "Find a plumber near me"})
+
+    async def call(i):
+        response = await client.post("/api/ai/chat", json={"message": "find a plumber near me?"})
+        return response.status_code == 200 and (await response.get_json())["tokens"]["cached"]
+    return call
+
+
+@scenario("endpoint/POST /api/ai/chat/stream", "endpoint", requires=ENDPOINT_REQUIRES)
+async def chat_stream(ctx):
+    client = await ctx.client()
+
+    async def call(i):
+        response = await client.post("/api/ai/chat/stream", json={"message": f"Stream plumber answer {i}"})
+        body = await response.get_data(as_text=True)
+        return response.status_code == 200 and "event: done" in body
+    return call
+
+
+@scenario("endpoint/POST /api/ai/research", "endpoint", requires=ENDPOINT_REQUIRES)
+async def research(ctx):
+    client = await ctx.client()
+
+    async def call(i):
+        return (await client.post("/api/ai/research", json={"query": f"plumbers {i}"})).status_code == 200
+    return call
+
+
+@scenario("endpoint/POST /webhook/storage", "endpoint", requires=ENDPOINT_REQUIRES)
+async def storage_event(ctx):
+    client = await ctx.client()
+
+    async def call(i):
+        response = await client.post(
+            "/webhook/storage",
+            json={"bucket": "bench", "name": f"notes/{i}.txt", "contentType": "text/plain", "size": 10},
+            headers={"Ce-Id": f"bench-{time.time_ns()}-{i}", "Ce-Type": "google.cloud.storage.object.v1.finalized"},
+        )
+        return response.status_code == 200
+    return call
+
+
+@scenario("endpoint/POST /api/verify/face", "endpoint", requires=ENDPOINT_REQUIRES + ("torch", "facenet_pytorch"),
+          model=True)
+async def verify_face_route(ctx):
+    client = await ctx.client()
+    faces = ctx.files["faces"]
+
+    async def call(i):
+        response = await client.post("/api/verify/face", json={
+            "id_url": ctx.site.url(f"/files/{faces[i % len(faces)]}"),
+            "selfie_url": ctx.site.url(f"/files/{faces[(i + 1) % len(faces)]}"),
+        })
+        return response.status_code == 200
+    return call
+
+
+@scenario("endpoint/POST /api/verify/k1", "endpoint", requires=ENDPOINT_REQUIRES + ("torch", "transformers"),
+          model=True)
+async def verify_k1_route(ctx):
+    client = await ctx.client()
+    pages = ctx.files["k1_pages"]
+
+    async def call(i):
+        response = await client.post("/api/verify/k1", json={"url": ctx.site.url(f"/files/{pages[i % len(pages)]}")})
+        return response.status_code == 200
+    return call
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+def missing_modules(names) -> list:
+    return [name for name in names if importlib.util.find_spec(name) is None]
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    """Per-stage count and mean latency recorded between two STAGE_SECONDS snapshots."""
+    stages = {}
+    for key, totals in after.items():
+        previous = before.get(key, {"count": 0, "sum": 0.0})
+        count = totals["count"] - previous["count"]
+        if count:
+            stages["/".join(key)] = {
+                "count": count,
+                "mean_ms": round((totals["sum"] - previous["sum"]) / count * 1000, 3),
+            }
+    return stages
+
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+async def run_all(args) -> dict:
+    from benchmarks import fixtures
+    from benchmarks.harness import measure
+    from benchmarks.site import FixtureSite
+    from services import metrics
+
+    workdir = tempfile.mkdtemp(prefix="locale-bench-")
+    files_dir = os.path.join(workdir, "fixtures")
+    # One K-1 page per timed request (plus warm-up) so the cold OCR scenario never hits the cache
+    files = await asyncio.to_thread(
+        fixtures.build, files_dir, k1_pages=args.model_requests + args.warmup, face_dir=args.face_dir
+    )
+    os.environ["HARVEST_STATE_DIR"] = os.path.join(workdir, "app-harvest")
+    os.environ["OCR_CACHE_PATH"] = os.path.join(workdir, "app-ocr.sqlite")
+
+    results = {}
+    with FixtureSite(files_dir, businesses=args.businesses) as site:
+        ctx = Context(args, site, files, workdir)
+        try:
+            for entry in SCENARIOS:
+                name = entry["name"]
+                if args.only and not any(fnmatch.fnmatch(name, f"*{pattern}*") for pattern in args.only):
+                    continue
+                missing = missing_modules(entry["requires"])
+                if missing:
+                    results[name] = {"kind": entry["kind"], "skipped": f"not installed: {', '.join(missing)}"}
+                    print(f"{name:<45} skipped ({results[name]['skipped']})")
+                    continue
+
+                requests = args.model_requests if entry["model"] else args.requests
+                concurrency = args.model_concurrency if entry["model"] else args.concurrency
+                if name.startswith("service/url_fetcher.fetch_many"):
+                    requests, concurrency = max(1, args.requests // 50), 1
+                try:
+                    call = await entry["factory"](ctx)
+                    before = metrics.STAGE_SECONDS.snapshot()
+                    result = await measure(call, requests, concurrency, warmup=args.warmup)
+                    result["stages"] = stage_breakdown(before, metrics.STAGE_SECONDS.snapshot())
+                except Exception as e:
+                    result = {"failed": f"{type(e).__name__}: {e}"}
+                results[name] = {"kind": entry["kind"], **result}
+                print(summary_line(name, results[name]))
+        finally:
+            await ctx.close()
+    return {"fixtures": files, "results": results}
+
+
+def summary_line(name: str, result: dict) -> str:
+    if "failed" in result:
+        return f"{name:<45} FAILED {result['failed']}"
+    latency = result["latency_ms"]
+    errors = f"  errors={result['errors']} ({result['first_error']})" if result["errors"] else ""
+    return (f"{name:<45} {result['throughput_rps']:>9.1f} req/s  p50={latency['p50']:.1f}ms "
+            f"p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms  peak={result['memory_mb']['peak_rss']:.0f}MB{errors}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="*", help="Run scenarios whose name contains any of these patterns")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--model-requests", type=int, default=8, help="Requests for model/browser scenarios")
+    parser.add_argument("--model-concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed calls before each scenario")
+    parser.add_argument("--vertex-latency-ms", type=float, default=200, help="Stub Vertex model latency")
+    parser.add_argument("--businesses", type=int, default=200, help="Business pages on the fixture site")
+    parser.add_argument("--face-dir", help="Directory of real face photos (else synthetic faces)")
+    parser.add_argument("--output", help="Result file (default benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    # Configure the app before anything imports it
+    os.environ["VERTEX_STUB"] = "1"
+    os.environ["VERTEX_STUB_LATENCY_MS"] = str(args.vertex_latency_ms)
+    os.environ.setdefault("PRELOAD_MODELS", "")
+    os.environ.setdefault("METRICS_ENABLED", "true")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    started = time.time()
+    report = asyncio.run(run_all(args))
+    revision = git_revision()
+    report["meta"] = {
+        **revision,
+        "started_at": started,
+        "duration_s": round(time.time() - started, 1),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"{(revision['commit'] or 'local')[:12]}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
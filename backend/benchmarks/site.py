@@ -0,0 +1,158 @@
+"""
+Local stand-in for the sites the harvester and URLFetcher crawl.
+
+FixtureSite serves, from a background thread on 127.0.0.1:
+
+- /directory.html   a listing page: many phones, links to every business
+- /biz/<n>.html     static business pages (title, phone, email, links)
+- /js/<n>.html      pages rendered by script. They answer 403 to clients
+                    without a browser User-Agent, like sites that block
+                    bots, so URLFetcher.fetch() falls back to Playwright.
+- /files/<name>     fixture files (face images, K-1 scans) from files_dir
+
+Pages send an ETag and honour If-None-Match. Add ?delay_ms=N to any
+path to simulate a slow origin.
+"""
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".pdf": "application/pdf"}
+
+
+def business_page(n: int, businesses: int) -> str:
+    neighbours = "".join(f'<a href="/biz/{(n + step) % businesses}.html">Partner {step}</a> ' for step in (1, 2, 3))
+    filler = " ".join(["Licensed, insured and family owned since 1987."] * 40)
+    return f"""<!doctype html>
+<html><head><title>Business {n} Plumbing LLC</title>
+<style>body {{ font-family: sans-serif; }}</style>
+<script>window.analytics = [];</script></head>
+<body><h1>Business {n} Plumbing</h1>
+<p>{filler}</p>
+<p>Call us at (512) 555-{n:04d} or email <a href="mailto:office{n}@business{n}.example">office{n}@business{n}.example</a></p>
+<nav>{neighbours}</nav></body></html>"""
+
+
+def directory_page(businesses: int) -> str:
+    rows = "".join(
+        f'<li><a href="/biz/{n}.html">Business {n}</a> (512) 555-{n:04d}</li>' for n in range(businesses)
+    )
+    return f"<!doctype html><html><head><title>Plumbers directory</title></head><body><ul>{rows}</ul></body></html>"
+
+
+def js_page(n: int) -> str:
+    return f"""<!doctype html>
+<html><head><title>Loading...</title></head><body><div id="app"></div>
+<script>
+document.title = "Rendered Business {n}";
+document.getElementById("app").innerHTML =
+  "<h1>Rendered Business {n}</h1><p>Call (737) 555-{n:04d}</p>";
+</script></body></html>"""
+
+
+class FixtureSite:
+    def __init__(self, files_dir: str = None, businesses: int = 200):
+        self.files_dir = files_dir
+        self.businesses = businesses
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def start(self) -> "FixtureSite":
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                site._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        parts = urlsplit(handler.path)
+        delay_ms = float(parse_qs(parts.query).get("delay_ms", ["0"])[0])
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+
+        body, content_type = self._resolve(parts.path, handler.headers.get("User-Agent", ""))
+        if body is None:
+            self._send(handler, 404, b"not found", "text/plain")
+            return
+        if body is False:
+            self._send(handler, 403, b"browser required", "text/plain")
+            return
+
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if handler.headers.get("If-None-Match") == etag:
+            self._send(handler, 304, b"", content_type, etag)
+            return
+        self._send(handler, 200, body, content_type, etag)
+
+    def _resolve(self, path: str, user_agent: str):
+        if path == "/directory.html":
+            return directory_page(self.businesses).encode(), "text/html; charset=utf-8"
+        if path.startswith("/biz/") and path.endswith(".html"):
+            n = _page_number(path)
+            if n is not None and n < self.businesses:
+                return business_page(n, self.businesses).encode(), "text/html; charset=utf-8"
+        if path.startswith("/js/") and path.endswith(".html"):
+            n = _page_number(path)
+            if n is not None:
+                if "Chrome" not in user_agent:
+                    return False, None
+                return js_page(n).encode(), "text/html; charset=utf-8"
+        if path.startswith("/files/") and self.files_dir:
+            name = os.path.basename(path)
+            file_path = os.path.join(self.files_dir, name)
+            if os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    return f.read(), CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+        return None, None
+
+    @staticmethod
+    def _send(handler, status: int, body: bytes, content_type: str, etag: str = None) -> None:
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("Cache-Control", "no-cache")
+        if etag:
+            handler.send_header("ETag", etag)
+        handler.end_headers()
+        if body:
+            handler.wfile.write(body)
+
+
+def _page_number(path: str):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return int(stem) if stem.isdigit() else None
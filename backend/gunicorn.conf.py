@@ -0,0 +1,69 @@
+"""
+Gunicorn settings for the Locale backend.
+
+Each worker is a uvicorn event loop running the Quart app, so one worker
+serves hundreds of concurrent I/O-bound requests (Vertex AI, downloads,
+page fetches). CPU-heavy work (OCR, face embeddings) already runs off the
+loop in threads or the background job pool.
+
+With several workers, the models (PRELOAD_MODELS) are loaded once in the
+master before forking, so workers share the weights copy-on-write
+instead of each holding a private copy. With a single worker, the worker
+loads them in the background instead, so /health answers right away and
+/ready turns 200 once they are warm. SQLite-backed stores built in the
+master (webhook dedup, OCR cache) connect on first use in each process,
+so no connection crosses the fork.
+"""
+import gc
+import os
+import sys
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Cloud Run scales by instance; keep one worker per instance unless the CPU allows more
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+# Worker heartbeat, not request duration: a worker whose event loop is blocked this long is restarted
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# On SIGTERM stop accepting, let in-flight requests finish, then run after_serving.
+# Cloud Run sends SIGKILL 10s after SIGTERM, so stay under that there.
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 9))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+# Import main:app in the master, before fork (cheap: heavy libraries load lazily)
+preload_app = True
+preload_models_before_fork = os.environ.get("PRELOAD_BEFORE_FORK", str(workers > 1)).lower() in ("1", "true", "yes")
+
+
+def when_ready(server):
+    import main
+
+    if not preload_models_before_fork or not main.preload_model_names():
+        return
+    started = time.monotonic()
+    try:
+        # One intra-op thread while loading: an OpenMP pool started here would not survive fork
+        import torch
+
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    main.preload_models()
+    # Keep the GC from writing to (and so un-sharing) every preloaded object's pages
+    gc.freeze()
+    server.log.info(
+        f"Preloaded {main.preload_model_names()} in {time.monotonic() - started:.1f}s "
+        f"({time.monotonic() - main.STARTED_AT:.1f}s since start): {main.memory_usage()}"
+    )
+
+
+def post_fork(server, worker):
+    if "torch" in sys.modules:
+        import torch
+
+        torch.set_num_threads(int(os.environ.get("TORCH_NUM_THREADS", os.cpu_count() or 1)))
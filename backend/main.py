@@ -2,32 +2,72 @@
 Locale by ACHIEVEMOR - Backend API Server
 Cloud Run Deployment Ready
 
+Async (Quart) app served by gunicorn with uvicorn workers, see gunicorn.conf.py.
+
 This backend handles:
 - Storage event webhooks (Eventarc)
 - AI Companion API integration
+- Face and K-1 document verification
 - Business harvester triggers
 - Stripe webhook forwarding
 
 Environment Variables:
 - PORT: Cloud Run port (default 8080)
+- WEB_CONCURRENCY: Worker processes (default 1 on Cloud Run; scale instances instead).
+  Background job status is kept per worker, so /api/jobs/<id> needs a single worker
+- SHUTDOWN_DRAIN_SECONDS: How long shutdown waits for running background jobs
+- PRELOAD_MODELS: Models loaded before serving, gating /ready (default "face,ocr"; "" for none)
+- MODEL_RETRY_SECONDS: Wait before /ready retries a model load that failed (default 30)
+- METRICS_ENABLED: Record route and stage latencies for /metrics (default true)
+- PROFILER_ENABLED: Expose the sampling profiler at /debug/profile (default off)
+- PRELOAD_BEFORE_FORK: Load PRELOAD_MODELS in the gunicorn master (default: when WEB_CONCURRENCY > 1)
 - GCP_PROJECT_ID: Google Cloud Project ID
 - STORAGE_BUCKET: GCS bucket for file uploads
 - GEMINI_API_KEY: For AI Companion integration
+- VERTEX_STUB: Use a local stub model instead of Vertex AI (tests, benchmarks)
+- PROMPT_CACHE_TTL / PROMPT_CACHE_SIZE: AI response cache lifetime and capacity
+- PROMPT_CACHE_DISABLED_CONTEXTS: Comma-separated contexts that are never cached
+- PDF_DPI: Rasterization DPI for scanned PDF pages (default 200)
+- JOB_IO_WORKERS / JOB_CPU_WORKERS: Background job pool sizes
+- JOB_MAX_PENDING: Queued jobs per pool before webhooks answer 503
+- JOB_SPOOL_DIR: Where a stopping worker leaves unfinished jobs for the next start ("" to drop them)
+- EVENT_DEDUP_PATH: SQLite file so webhook dedup survives restarts and is shared by workers (optional)
+- HARVEST_STATE_DIR: Harvest checkpoint directory (mount a GCS volume to survive restarts)
+- HARVEST_SEED_TEMPLATE: Seed URL(s) for a harvest, comma-separated, with {city}/{state}/{industry}
+- HARVEST_MAX_PAGES / HARVEST_STALE_HOURS: Crawl budget per job and page re-fetch age
 """
 
 import os
 import json
+import asyncio
+import concurrent.futures
 import logging
+import tempfile
+import threading
+import time
+import functools
 from datetime import datetime
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from urllib.parse import quote_plus
+from quart import Quart, Response, g, request, jsonify, stream_with_context
+from quart_cors import cors
+
+from services import metrics
+from services.dedup import CLAIMED, PENDING, EventDeduplicator
+from services.harvester import HarvestBusy, HarvestEngine
+from services.jobs import JobQueue, QueueFull
+from services.metrics import memory_usage
+from services.prompt_cache import PromptCache
+from services.vertex_client import get_vertex_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
+# Startup time is reported from here (in the gunicorn master when preloading)
+STARTED_AT = time.monotonic()
+
+app = Quart(__name__)
+app = cors(app, allow_origin="*")
 
 # ============================================
 # CONFIGURATION
@@ -37,12 +77,119 @@ PORT = int(os.environ.get("PORT", 8080))
 GCP_PROJECT_ID = os.environ.get("GCP_PROJECT_ID", "locale-by-achievemor")
 STORAGE_BUCKET = os.environ.get("STORAGE_BUCKET", "locale-uploads")
 
+# ============================================
+# SERVICES (created on first use)
+# ============================================
+
+_k1_parser = None
+_face_verifier = None
+_storage_client = None
+_services_lock = threading.Lock()
+# This worker's event loop, set by startup(); background jobs run async work on it
+_serving_loop = None
+
+# Answers to repeated prompts, shared by the AI endpoints
+prompt_cache = PromptCache.from_env()
+
+# Background work for webhooks (local stand-in for Pub/Sub)
+job_queue = JobQueue.from_env()
+
+# Ids of webhook events already handled (Eventarc Ce-Id, Stripe event id)
+event_dedup = EventDeduplicator.from_env()
+
+# Checkpointed business crawls, one per city/state/industry
+harvest_engine = HarvestEngine.from_env()
+
+def get_k1_parser():
+    """Shared K1Parser; loading TrOCR is expensive so do it once per worker"""
+    global _k1_parser
+    with _services_lock:
+        if _k1_parser is None:
+            from services.k1_parser import K1Parser
+            _k1_parser = K1Parser()
+    return _k1_parser
+
+def get_face_verifier():
+    """Shared FaceVerifier (FaceNet weights, embedding cache, face index)"""
+    global _face_verifier
+    with _services_lock:
+        if _face_verifier is None:
+            from services.face_verifier import FaceVerifier
+            _face_verifier = FaceVerifier()
+    return _face_verifier
+
+def warm_vertex_client():
+    """Build the Vertex model at worker start, off the request path"""
+    if os.environ.get("VERTEX_WARM_ON_START", "true").lower() in ("1", "true", "yes"):
+        threading.Thread(target=get_vertex_client(GCP_PROJECT_ID).warm, name="vertex-warm", daemon=True).start()
+
+# Loaders for PRELOAD_MODELS, and each model's "loading" / "ready" / "failed: ..." state
+MODEL_LOADERS = {"face": get_face_verifier, "ocr": get_k1_parser}
+_model_status = {}
+# Held while a preload runs; monotonic time of the last failed load, for /ready's retry
+_preload_lock = threading.Lock()
+_model_failed_at = None
+
+def preload_model_names() -> list:
+    names = [name.strip() for name in os.environ.get("PRELOAD_MODELS", "face,ocr").split(",") if name.strip()]
+    unknown = [name for name in names if name not in MODEL_LOADERS]
+    if unknown:
+        raise ValueError(f"Unknown PRELOAD_MODELS {unknown}; choose from {sorted(MODEL_LOADERS)}")
+    return names
+
+# A typo fails the deploy here instead of leaving /ready at 503 forever
+preload_model_names()
+
+def preload_models():
+    """
+    Load the PRELOAD_MODELS weights. gunicorn.conf.py calls this in the
+    master before forking, so workers share the weights copy-on-write;
+    otherwise startup() runs it in a background thread. Models that failed
+    are tried again on the next call.
+    """
+    global _model_failed_at
+    with _preload_lock:
+        for name in preload_model_names():
+            if _model_status.get(name) == "ready":
+                continue
+            _model_status[name] = "loading"
+            started = time.monotonic()
+            try:
+                MODEL_LOADERS[name]()
+                _model_status[name] = "ready"
+                logger.info(f"Loaded {name} model in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                _model_status[name] = f"failed: {e}"
+                _model_failed_at = time.monotonic()
+                logger.error(f"Loading {name} model failed: {str(e)}")
+
+def models_ready() -> bool:
+    return all(_model_status.get(name) == "ready" for name in preload_model_names())
+
+def retry_failed_models():
+    """Reload failed models in the background once MODEL_RETRY_SECONDS have passed since the failure"""
+    global _model_failed_at
+    failed = any(_model_status.get(name, "").startswith("failed") for name in preload_model_names())
+    if not failed or _preload_lock.locked():
+        return
+    if time.monotonic() - _model_failed_at < float(os.environ.get("MODEL_RETRY_SECONDS", 30)):
+        return
+    _model_failed_at = time.monotonic()
+    threading.Thread(target=preload_models, name="model-preload", daemon=True).start()
+
+def get_storage_client():
+    global _storage_client
+    if _storage_client is None:
+        from google.cloud import storage
+        _storage_client = storage.Client(project=GCP_PROJECT_ID)
+    return _storage_client
+
 # ============================================
 # HEALTH CHECK
 # ============================================
 
 @app.route("/", methods=["GET"])
-def health_check():
+async def health_check():
     """Health check endpoint for Cloud Run"""
     return jsonify({
         "status": "healthy",
@@ -53,16 +200,143 @@ def health_check():
     })
 
 @app.route("/health", methods=["GET"])
-def health():
+async def health():
     """Alias health endpoint"""
-    return health_check()
+    return await health_check()
+
+@app.route("/ready", methods=["GET"])
+async def ready():
+    """
+    Readiness probe: 503 until the PRELOAD_MODELS are loaded
+    /health stays instant for liveness; point the startup probe here
+    """
+    is_ready = models_ready()
+    if not is_ready:
+        # A transient failure (weights download, disk) must not keep the instance out of rotation
+        retry_failed_models()
+    return jsonify({
+        "ready": is_ready,
+        "models": {name: _model_status.get(name, "pending") for name in preload_model_names()},
+        "vertex_loaded": get_vertex_client(GCP_PROJECT_ID).health()["loaded"],
+        "uptime_seconds": round(time.monotonic() - STARTED_AT, 1),
+        "memory": memory_usage()
+    }), 200 if is_ready else 503
+
+@app.route("/health/ai", methods=["GET"])
+async def ai_health():
+    """Vertex AI client state (loaded, marked down, last error)"""
+    return jsonify(get_vertex_client(GCP_PROJECT_ID).health())
+
+# ============================================
+# METRICS & PROFILING
+# ============================================
+
+HTTP_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Route latency (to first byte for streamed responses)", ("method", "route", "status")
+)
+HTTP_REQUESTS = metrics.counter("http_requests_total", "Requests served", ("method", "route", "status"))
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+async def record_request(response):
+    if metrics.ENABLED and "request_started" in g:
+        # Label by route pattern, not path, so ids do not explode the series count
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        labels = {"method": request.method, "route": route, "status": response.status_code}
+        HTTP_SECONDS.observe(time.perf_counter() - g.request_started, **labels)
+        HTTP_REQUESTS.inc(**labels)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+async def prometheus_metrics():
+    """
+    Route and per-stage latency histograms in Prometheus text format
+    Covers this worker only, including the background jobs it runs (they run on its threads)
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/debug/profile", methods=["GET"])
+async def sample_profile():
+    """
+    Sample every thread's stack for ?seconds= (default 10, max 60)
+    Returns collapsed stacks for flamegraph.pl / speedscope; off unless PROFILER_ENABLED
+    """
+    if os.environ.get("PROFILER_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return jsonify({"error": "Profiler disabled"}), 404
+    try:
+        seconds = float(request.args.get("seconds", 10))
+        interval_ms = float(request.args.get("interval_ms", 5))
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    if not seconds > 0 or not 1 <= interval_ms <= 1000:
+        return jsonify({"error": "seconds must be positive and interval_ms between 1 and 1000"}), 400
+    seconds = min(seconds, 60)
+    profiler = metrics.SamplingProfiler(interval=interval_ms / 1000)
+    profiler.start()
+    await asyncio.sleep(seconds)
+    return Response(await asyncio.to_thread(profiler.stop), mimetype="text/plain")
+
+# ============================================
+# WEBHOOK IDEMPOTENCY
+# ============================================
+
+async def eventarc_event_id():
+    return request.headers.get("Ce-Id")
+
+async def stripe_event_id():
+    return (await request.get_json(silent=True) or {}).get("id")
+
+def deduplicate(namespace: str, get_event_id):
+    """
+    Reject redelivered webhook events before the handler runs.
+    An event is claimed atomically when handling starts, marked done after a
+    2xx and released otherwise, so failed deliveries can be retried; a claim
+    left by a crashed worker expires after EVENT_DEDUP_CLAIM_TTL.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            event_id = await get_event_id()
+            state = await asyncio.to_thread(event_dedup.claim, namespace, event_id) if event_id else CLAIMED
+            if state == PENDING:
+                # Another delivery, in any worker, is still running: a retryable status keeps this copy alive in case it fails
+                return jsonify({"status": "in_progress", "id": event_id}), 409
+            if state != CLAIMED:
+                logger.info(f"Duplicate {namespace} event ignored: {event_id}")
+                # 200 so the sender stops redelivering
+                return jsonify({"status": "duplicate", "id": event_id}), 200
+            
+            try:
+                response = await view(*args, **kwargs)
+            except BaseException:
+                if event_id:
+                    event_dedup.unmark(namespace, event_id)
+                raise
+            status = response[1] if isinstance(response, tuple) else response.status_code
+            if event_id:
+                if 200 <= status < 300:
+                    await asyncio.to_thread(event_dedup.complete, namespace, event_id)
+                else:
+                    await asyncio.to_thread(event_dedup.unmark, namespace, event_id)
+            return response
+        return wrapper
+    return decorator
+
+@app.route("/api/events/dedup", methods=["GET"])
+async def dedup_stats():
+    """Duplicate delivery counts and rate"""
+    return jsonify(event_dedup.stats())
 
 # ============================================
 # STORAGE EVENT WEBHOOK (Eventarc)
 # ============================================
 
 @app.route("/webhook/storage", methods=["POST"])
-def storage_webhook():
+@deduplicate("eventarc", eventarc_event_id)
+async def storage_webhook():
     """
     Handle Cloud Storage events via Eventarc
     Triggers when files are uploaded to the bucket
@@ -77,7 +351,7 @@ def storage_webhook():
         logger.info(f"Source: {ce_source}, Subject: {ce_subject}")
         
         # Parse the event data
-        event_data = request.get_json(silent=True) or {}
+        event_data = await request.get_json(silent=True) or {}
         
         # Extract file information
         bucket = event_data.get("bucket", "")
@@ -88,25 +362,37 @@ def storage_webhook():
         logger.info(f"File uploaded: gs://{bucket}/{name}")
         logger.info(f"Content-Type: {content_type}, Size: {size} bytes")
         
-        # Process based on file type
+        # Queue processing based on file type and acknowledge right away,
+        # so slow OCR/face work never runs past the Eventarc delivery timeout
         if content_type.startswith("image/"):
             # Trigger image processing (e.g., profile photos)
-            result = process_image_upload(bucket, name, event_data)
+            job_type = "image"
         elif content_type.startswith("application/pdf"):
             # Trigger document processing (e.g., verification docs)
-            result = process_document_upload(bucket, name, event_data)
+            job_type = "document"
         elif content_type.startswith("video/"):
             # Trigger video processing (e.g., Kie.ai generation)
-            result = process_video_upload(bucket, name, event_data)
+            job_type = "video"
         else:
+            job_type = None
+        
+        if job_type is None:
             result = {"action": "stored", "file": name}
+        else:
+            try:
+                job_id = job_queue.submit(job_type, {"bucket": bucket, "name": name, "data": event_data})
+            except QueueFull as e:
+                # Non-2xx makes Eventarc redeliver later, which is our backpressure
+                logger.warning(f"Rejecting {name}: {str(e)}")
+                return jsonify({"error": "Job queue full, retry later"}), 503
+            result = {"action": f"{job_type}_queued", "file": name, "job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
         
         return jsonify({
             "success": True,
             "event_type": ce_type,
             "file": f"gs://{bucket}/{name}",
             "result": result
-        }), 200
+        }), 202 if job_type else 200
         
     except Exception as e:
         logger.error(f"Storage webhook error: {str(e)}")
@@ -122,9 +408,23 @@ def process_image_upload(bucket: str, name: str, data: dict) -> dict:
 def process_document_upload(bucket: str, name: str, data: dict) -> dict:
     """Process uploaded documents (OCR, verification)"""
     logger.info(f"Processing document: {name}")
-    # TODO: Integrate with Document AI for OCR
+    pages = run_on_serving_loop(parse_pdf_from_storage(bucket, name))
     # TODO: Trigger Ballerine verification flow
-    return {"action": "document_queued", "file": name}
+    return {"action": "document_parsed", "file": name, "pages": pages}
+
+async def parse_pdf_from_storage(bucket: str, name: str) -> list:
+    """Stream a PDF from GCS through the K-1 parser page by page"""
+    blob = get_storage_client().bucket(bucket).blob(name)
+    # Spool to disk so the PDF is never held in memory whole
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        await asyncio.to_thread(blob.download_to_filename, tmp.name)
+        # A cold load takes the services lock and reads TrOCR; keep it off the serving loop
+        parser = await asyncio.to_thread(get_k1_parser)
+        pages = []
+        async for page in parser.parse_pdf(tmp.name):
+            logger.info(f"Parsed {name} page {page['page']}: {page['status']} ({page.get('source', '-')})")
+            pages.append(page)
+        return pages
 
 def process_video_upload(bucket: str, name: str, data: dict) -> dict:
     """Process uploaded videos (transcoding, AI analysis)"""
@@ -132,18 +432,62 @@ def process_video_upload(bucket: str, name: str, data: dict) -> dict:
     # TODO: Trigger transcoding via Cloud Video Transcoder
     return {"action": "video_queued", "file": name}
 
+def run_on_serving_loop(coro):
+    """
+    Run a coroutine from a job thread on this worker's event loop, so it shares the
+    loaded models, micro-batchers and HTTP clients with requests
+    Without a serving loop (scripts, tests) it runs on a fresh one
+    """
+    loop = _serving_loop
+    if loop is None or not loop.is_running():
+        return asyncio.run(coro)
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    while True:
+        try:
+            return future.result(timeout=1)
+        except concurrent.futures.TimeoutError:
+            if not loop.is_running():
+                # Worker exited mid-job; do not block interpreter shutdown on it
+                future.cancel()
+                raise RuntimeError("Event loop stopped before the job finished")
+
+# API calls and OCR/model work get separate, separately sized thread pools
+job_queue.register("image", process_image_upload, kind="io")
+job_queue.register("document", process_document_upload, kind="cpu")
+job_queue.register("video", process_video_upload, kind="io")
+
+# ============================================
+# BACKGROUND JOB STATUS
+# ============================================
+
+@app.route("/api/jobs", methods=["GET"])
+async def jobs_overview():
+    """Queue depth and job counts by state"""
+    return jsonify(job_queue.stats())
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+async def job_status(job_id: str):
+    """
+    Status, attempts and result of a background job
+    Jobs are tracked in the worker that accepted them (see WEB_CONCURRENCY)
+    """
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
+
 # ============================================
 # AI COMPANION API (Gemini via Vertex AI)
 # ============================================
 
 @app.route("/api/ai/chat", methods=["POST"])
-def ai_chat():
+async def ai_chat():
     """
     AI Chat endpoint using Gemini via Vertex AI
     Wired to II-Agent / ACHEEVY ecosystem
     """
     try:
-        data = request.get_json()
+        data = await request.get_json()
         message = data.get("message", "")
         context = data.get("context", "general")
         history = data.get("history", [])
@@ -151,63 +495,54 @@ def ai_chat():
         if not message:
             return jsonify({"error": "Message required"}), 400
         
-        # Try Vertex AI Gemini first
+        vertex = get_vertex_client(GCP_PROJECT_ID)
+        
+        # Repeated questions in the same context skip the model call
+        cache_key = prompt_cache.key("chat", message, context, vertex.label, history)
+        cached = prompt_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(mark_cached(cached)), 200
+        
+        # Try Vertex AI Gemini first (skipped instantly while it is marked down)
         try:
-            import google.auth
-            from google.cloud import aiplatform
-            from google.protobuf import json_format
-            from google.protobuf.struct_pb2 import Value
-            
-            # Initialize Vertex AI
-            aiplatform.init(project=GCP_PROJECT_ID, location="us-central1")
-            
-            # Use Gemini model via Vertex AI
-            from vertexai.generative_models import GenerativeModel, Part
-            
-            model = GenerativeModel("gemini-2.0-flash-exp")
-            
             # Build prompt with context
-            system_prompt = f"""You are ACHEEVY, an intelligent AI assistant for the Locale platform.
-You help users with:
-- Finding local professionals and services
-- Managing tasks and projects
-- Business intelligence and analytics
-- Code generation and technical help
-
-Context: {context}
-User query: {message}
-
-Respond helpfully and concisely."""
+            system_prompt = build_chat_prompt(message, context)
             
-            response = model.generate_content(system_prompt)
+            response_text = await vertex.agenerate(system_prompt)
             
-            ai_response = response.text if response.text else "I'm processing your request..."
+            ai_response = response_text if response_text else "I'm processing your request..."
             
-            return jsonify({
+            response = {
                 "response": ai_response,
-                "model": "gemini-2.0-flash-exp",
+                "model": vertex.label,
                 "context": context,
                 "agent": "ACHEEVY",
                 "tokens": {
                     "input": len(message.split()),
                     "output": len(ai_response.split()),
-                    "total": len(message.split()) + len(ai_response.split())
+                    "total": len(message.split()) + len(ai_response.split()),
+                    "cached": False
                 }
-            }), 200
+            }
+            if response_text:
+                prompt_cache.put(cache_key, response)
+            
+            return jsonify(response), 200
             
         except Exception as vertex_error:
             logger.warning(f"Vertex AI unavailable, using fallback: {str(vertex_error)}")
             
             # Fallback response when Vertex AI is not configured
             response = {
-                "response": f"[ACHEEVY] Processing: {message[:200]}{'...' if len(message) > 200 else ''}\n\nI'm currently in setup mode. Once Vertex AI credentials are configured, I'll provide intelligent responses powered by Gemini 2.0 Flash.",
+                "response": fallback_text(message),
                 "model": "fallback",
                 "context": context,
                 "agent": "ACHEEVY",
                 "tokens": {
                     "input": len(message.split()),
                     "output": 50,
-                    "total": len(message.split()) + 50
+                    "total": len(message.split()) + 50,
+                    "cached": False
                 }
             }
             
@@ -217,31 +552,139 @@ Respond helpfully and concisely."""
         logger.error(f"AI chat error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def build_chat_prompt(message: str, context: str) -> str:
+    """ACHEEVY system prompt shared by the blocking and streaming chat endpoints"""
+    return f"""You are ACHEEVY, an intelligent AI assistant for the Locale platform.
+You help users with:
+- Finding local professionals and services
+- Managing tasks and projects
+- Business intelligence and analytics
+- Code generation and technical help
+
+Context: {context}
+User query: {message}
+
+Respond helpfully and concisely."""
+
+def fallback_text(message: str) -> str:
+    """Reply used when Vertex AI is not configured or marked down"""
+    return f"[ACHEEVY] Processing: {message[:200]}{'...' if len(message) > 200 else ''}\n\nI'm currently in setup mode. Once Vertex AI credentials are configured, I'll provide intelligent responses powered by Gemini 2.0 Flash."
+
+def mark_cached(body: dict) -> dict:
+    """Copy of a cached response flagged as a cache hit (no model spend)"""
+    body = dict(body)
+    if "tokens" in body:
+        body["tokens"] = {**body["tokens"], "cached": True}
+    else:
+        body["cached"] = True
+    return body
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/api/ai/chat/stream", methods=["POST"])
+async def ai_chat_stream():
+    """
+    Streaming AI Chat endpoint (Server-Sent Events)
+    Emits `token` events as Gemini produces text, then a closing `done`
+    event carrying model, context and token counts.
+    """
+    data = await request.get_json(silent=True) or {}
+    message = data.get("message", "")
+    context = data.get("context", "general")
+    history = data.get("history", [])
+    
+    if not message:
+        return jsonify({"error": "Message required"}), 400
+    
+    vertex = get_vertex_client(GCP_PROJECT_ID)
+    cache_key = prompt_cache.key("chat", message, context, vertex.label, history)
+    cached = prompt_cache.get(cache_key)
+    
+    @stream_with_context
+    async def generate():
+        if cached is not None:
+            # Same cache as /api/ai/chat: replay the whole answer as one token
+            body = mark_cached(cached)
+            yield sse_event("token", {"text": body.pop("response")})
+            yield sse_event("done", body)
+            return
+        
+        model = vertex.label
+        output_words = 0
+        chunks = []
+        try:
+            async for text in vertex.agenerate_stream(build_chat_prompt(message, context)):
+                output_words += len(text.split())
+                chunks.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as vertex_error:
+            if output_words:
+                # Already mid-answer; tell the client rather than switching voices
+                logger.error(f"AI chat stream interrupted: {str(vertex_error)}")
+                yield sse_event("error", {"error": str(vertex_error)})
+                return
+            logger.warning(f"Vertex AI unavailable, using fallback: {str(vertex_error)}")
+            model = "fallback"
+            text = fallback_text(message)
+            output_words = len(text.split())
+            yield sse_event("token", {"text": text})
+        
+        done = {
+            "model": model,
+            "context": context,
+            "agent": "ACHEEVY",
+            "tokens": {
+                "input": len(message.split()),
+                "output": output_words,
+                "total": len(message.split()) + output_words,
+                "cached": False
+            }
+        }
+        if chunks:
+            prompt_cache.put(cache_key, {"response": "".join(chunks), **done})
+        yield sse_event("done", done)
+    
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        # Disable proxy buffering so tokens reach the browser as they are sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============================================
 # II-AGENT RESEARCH ENDPOINT
 # ============================================
 
 @app.route("/api/ai/research", methods=["POST"])
-def ai_research():
+async def ai_research():
     """
     Research endpoint using II-Researcher pattern
     """
     try:
-        data = request.get_json()
+        data = await request.get_json()
         query = data.get("query", "")
         depth = data.get("depth", "shallow")
         
         if not query:
             return jsonify({"error": "Query required"}), 400
         
+        cache_key = prompt_cache.key("research", query, "research", options={"depth": depth})
+        cached = prompt_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(mark_cached(cached)), 200
+        
         # Mock research results for now
-        return jsonify({
+        response = {
             "summary": f"Research results for: {query}",
             "sources": [
                 {"url": "https://example.com", "title": "Source 1", "snippet": "Relevant information..."}
             ],
-            "depth": depth
-        }), 200
+            "depth": depth,
+            "cached": False
+        }
+        prompt_cache.put(cache_key, response)
+        return jsonify(response), 200
         
     except Exception as e:
         logger.error(f"Research error: {str(e)}")
@@ -252,40 +695,116 @@ def ai_research():
 # ============================================
 
 @app.route("/api/ai/code", methods=["POST"])
-def ai_code():
+async def ai_code():
     """
     Code generation endpoint
     """
     try:
-        data = request.get_json()
+        data = await request.get_json()
         task = data.get("task", "")
         language = data.get("language", "python")
         
         if not task:
             return jsonify({"error": "Task required"}), 400
         
+        # Exact prompt: identifiers and symbols are case- and punctuation-sensitive
+        cache_key = prompt_cache.key("code", task, "code", options={"language": language}, exact=True)
+        cached = prompt_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(mark_cached(cached)), 200
+        
         # Mock code generation for now
-        return jsonify({
+        response = {
             "code": f"# Generated code for: {task}\n# Language: {language}\nprint('Hello from ACHEEVY!')",
             "language": language,
-            "output": None
-        }), 200
+            "output": None,
+            "cached": False
+        }
+        prompt_cache.put(cache_key, response)
+        return jsonify(response), 200
         
     except Exception as e:
         logger.error(f"Code generation error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# ============================================
+# IDENTITY & DOCUMENT VERIFICATION
+# ============================================
+
+@app.route("/api/verify/face", methods=["POST"])
+async def verify_face():
+    """
+    Compare the face on an ID with a selfie
+    With identity_id, also checks the face against enrolled identities
+    """
+    try:
+        data = await request.get_json()
+        id_url = data.get("id_url", "")
+        selfie_url = data.get("selfie_url", "")
+        
+        if not id_url or not selfie_url:
+            return jsonify({"error": "id_url and selfie_url required"}), 400
+        
+        # First call loads FaceNet; keep that off the event loop
+        verifier = await asyncio.to_thread(get_face_verifier)
+        result = await verifier.verify_face(id_url, selfie_url, data.get("identity_id"))
+        
+        return jsonify(result), 200 if result["status"] == "success" else 422
+        
+    except Exception as e:
+        logger.error(f"Face verification error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/verify/k1", methods=["POST"])
+async def verify_k1():
+    """
+    Extract EIN, partner name, income and deductions from a K-1 image
+    """
+    try:
+        data = await request.get_json()
+        url = data.get("url", "")
+        
+        if not url:
+            return jsonify({"error": "url required"}), 400
+        
+        parser = await asyncio.to_thread(get_k1_parser)
+        result = await parser.parse_k1(url)
+        
+        return jsonify(result), 200 if result["status"] == "success" else 422
+        
+    except Exception as e:
+        logger.error(f"K-1 parse error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 # ============================================
 # BUSINESS HARVESTER TRIGGER
 # ============================================
 
+def run_harvest_job(job_id: str, lease: str = None):
+    """Crawl a harvest job to completion (resumes from its checkpoint) under the lease taken when it was queued"""
+    try:
+        return asyncio.run(harvest_engine.run(job_id, lease))
+    except HarvestBusy as e:
+        # Our lease lapsed in the queue and another worker resumed it first
+        return {"job_id": job_id, "status": "already_running", "message": str(e)}
+
+job_queue.register("harvest", run_harvest_job, kind="io")
+
+def harvest_seed_urls(city: str, state: str, industry: str) -> list:
+    template = os.environ.get("HARVEST_SEED_TEMPLATE", "")
+    return [
+        seed.strip().format(city=quote_plus(city), state=quote_plus(state), industry=quote_plus(industry))
+        for seed in template.split(",") if seed.strip()
+    ]
+
 @app.route("/api/harvest/trigger", methods=["POST"])
-def trigger_harvest():
+async def trigger_harvest():
     """
     Trigger business harvester for a specific city
+    Re-triggering a finished harvest only re-fetches pages older than HARVEST_STALE_HOURS
     """
     try:
-        data = request.get_json()
+        data = await request.get_json()
         city = data.get("city", "")
         state = data.get("state", "")
         industry = data.get("industry", "General Services")
@@ -293,36 +812,88 @@ def trigger_harvest():
         if not city or not state:
             return jsonify({"error": "City and state required"}), 400
         
+        seed_urls = data.get("seed_urls") or harvest_seed_urls(city, state, industry)
+        
         logger.info(f"Harvesting businesses in {city}, {state} - Industry: {industry}")
         
-        # TODO: Trigger Cloud Function for actual harvesting
-        # For now, return mock data
+        try:
+            progress = await asyncio.to_thread(harvest_engine.prepare, city, state, industry, seed_urls)
+        except HarvestBusy as e:
+            return jsonify({"error": str(e)}), 409
+        
+        if progress["pending"] == 0 and progress["visited"] == 0:
+            return jsonify({"error": "No seed URLs (pass seed_urls or set HARVEST_SEED_TEMPLATE)"}), 400
+        
+        if progress["status"] == "queued":
+            try:
+                job_queue.submit("harvest", {"job_id": progress["job_id"], "lease": progress["lease"]})
+            except QueueFull:
+                # Paused, so the next trigger (or startup) picks it up again
+                await asyncio.to_thread(harvest_engine.release, progress["job_id"], progress["lease"])
+                return jsonify({"error": "Harvest queue full, retry later"}), 503
+        
         return jsonify({
             "success": True,
             "city": city,
             "state": state,
             "industry": industry,
-            "status": "harvest_queued",
-            "estimated_leads": 50
-        }), 200
+            "status": "harvest_queued" if progress["status"] == "queued" else "harvest_current",
+            "job_id": progress["job_id"],
+            "pending_pages": progress["pending"],
+            "leads_found": progress["leads"],
+            "status_url": f"/api/harvest/{progress['job_id']}"
+        }), 202 if progress["status"] == "queued" else 200
         
     except Exception as e:
         logger.error(f"Harvest trigger error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/harvest/<job_id>", methods=["GET"])
+async def harvest_status(job_id):
+    """Harvest progress: pages visited and pending, leads, pages/min and leads/min"""
+    progress = await asyncio.to_thread(harvest_engine.status, job_id)
+    if progress is None:
+        return jsonify({"error": "Unknown harvest"}), 404
+    return jsonify(progress)
+
+@app.route("/api/harvest/<job_id>/leads", methods=["GET"])
+async def harvest_leads(job_id):
+    """De-duplicated leads found so far"""
+    leads = await asyncio.to_thread(harvest_engine.leads, job_id)
+    if leads is None:
+        return jsonify({"error": "Unknown harvest"}), 404
+    return jsonify({"job_id": job_id, "count": len(leads), "leads": leads})
+
+def resume_harvests():
+    """
+    Re-queue harvests a previous instance left queued, paused or running
+    Every worker calls this at startup; claiming the lease first means each job is queued by one of them
+    """
+    for job_id in harvest_engine.incomplete_jobs():
+        lease = harvest_engine.claim(job_id)
+        if lease is None:
+            continue
+        try:
+            job_queue.submit("harvest", {"job_id": job_id, "lease": lease})
+            logger.info(f"Resuming harvest {job_id}")
+        except QueueFull:
+            harvest_engine.release(job_id, lease)
+            logger.warning(f"Harvest queue full, not resuming {job_id}")
+
 # ============================================
 # STRIPE WEBHOOK PROXY
 # ============================================
 
 @app.route("/webhook/stripe", methods=["POST"])
-def stripe_webhook_proxy():
+@deduplicate("stripe", stripe_event_id)
+async def stripe_webhook_proxy():
     """
     Proxy Stripe webhooks to Firebase Functions
     This allows Cloud Run to handle initial validation
     """
     try:
         signature = request.headers.get("Stripe-Signature", "")
-        payload = request.get_data(as_text=True)
+        payload = await request.get_data(as_text=True)
         
         logger.info("Stripe webhook received")
         
@@ -339,7 +910,8 @@ def stripe_webhook_proxy():
 # ============================================
 
 @app.route("/eventarc/receive", methods=["POST"])
-def eventarc_receive():
+@deduplicate("eventarc", eventarc_event_id)
+async def eventarc_receive():
     """
     Generic Eventarc receiver for Cloud Events
     Handles events from various GCP services
@@ -357,13 +929,14 @@ def eventarc_receive():
         
         logger.info(f"Eventarc event: {headers['ce-type']}")
         
-        data = request.get_json(silent=True) or {}
+        data = await request.get_json(silent=True) or {}
         
         # Route based on event type
         event_type = headers.get("ce-type", "")
         
         if "storage" in event_type.lower():
-            return storage_webhook()
+            # This route already claimed the event id; call the undecorated view
+            return await storage_webhook.__wrapped__()
         elif "firestore" in event_type.lower():
             return handle_firestore_event(data, headers)
         elif "pubsub" in event_type.lower():
@@ -386,6 +959,48 @@ def handle_pubsub_event(data: dict, headers: dict) -> tuple:
     logger.info(f"Pub/Sub event received")
     return jsonify({"status": "pubsub_processed"}), 200
 
+# ============================================
+# WORKER LIFECYCLE
+# ============================================
+
+@app.before_serving
+async def startup():
+    """Runs once per worker process before it accepts requests"""
+    global _serving_loop
+    _serving_loop = asyncio.get_running_loop()
+    # gRPC is not fork-safe, so Vertex is warmed per worker rather than preloaded
+    warm_vertex_client()
+    recovered = job_queue.recover()
+    if recovered:
+        logger.info(f"Re-queued {len(recovered)} background jobs left by a previous worker")
+    resume_harvests()
+    if not models_ready():
+        # Not preloaded by a gunicorn master (python main.py, or preload_app off)
+        threading.Thread(target=preload_models, name="model-preload", daemon=True).start()
+    logger.info(f"Worker {os.getpid()} serving {time.monotonic() - STARTED_AT:.1f}s after start: {memory_usage()}")
+
+@app.after_serving
+async def shutdown():
+    """
+    Runs once per worker after in-flight requests have drained
+    Lets running background jobs finish (bounded), spools the rest and closes shared clients
+    """
+    drain_seconds = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", 5))
+    try:
+        await asyncio.wait_for(asyncio.to_thread(job_queue.shutdown), drain_seconds)
+    except asyncio.TimeoutError:
+        logger.warning(f"Background jobs still running after {drain_seconds:.0f}s, exiting anyway")
+    # Their webhooks already answered 202 and dedup recorded the events, so no sender
+    # will redeliver them: keep queued and cut-off jobs for the next worker's startup
+    spooled = await asyncio.to_thread(job_queue.persist_unfinished)
+    if spooled:
+        logger.warning(f"Spooled {spooled} unfinished background jobs to {job_queue.spool_dir}")
+    
+    for service in (_face_verifier, _k1_parser):
+        if service is not None:
+            await service.downloader.aclose()
+    logger.info("Worker shut down cleanly")
+
 # ============================================
 # MAIN ENTRY POINT
 # ============================================
@@ -395,6 +1010,5 @@ if __name__ == "__main__":
     logger.info(f"Project: {GCP_PROJECT_ID}")
     logger.info(f"Storage Bucket: {STORAGE_BUCKET}")
     
-    # Run the Flask app
-    # Cloud Run sets PORT env var automatically
+    # Local development only; production runs `gunicorn -c gunicorn.conf.py main:app`
     app.run(host="0.0.0.0", port=PORT, debug=False)
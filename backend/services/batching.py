@@ -0,0 +1,101 @@
+"""
+Dynamic micro-batching for model inference.
+
+Callers submit single items and await their own result. A background task
+collects queued items until either max_batch_size is reached or the oldest
+item has waited max_wait_ms, then runs one batched call in a worker thread
+and hands each result back to its caller. Under load batches fill up and
+throughput scales with batch size; when idle a lone request waits at most
+the window.
+"""
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 5.0, name: str = "batcher"):
+        # batch_fn: list of items -> list of results, same length and order
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+    @classmethod
+    def from_env(cls, batch_fn, prefix: str, max_batch_size: int = 8, max_wait_ms: float = 5.0) -> "MicroBatcher":
+        """Read <prefix>_BATCH_SIZE and <prefix>_BATCH_WAIT_MS, e.g. FACE_BATCH_SIZE."""
+        return cls(
+            batch_fn,
+            max_batch_size=int(os.environ.get(f"{prefix}_BATCH_SIZE", max_batch_size)),
+            max_wait_ms=float(os.environ.get(f"{prefix}_BATCH_WAIT_MS", max_wait_ms)),
+            name=prefix.lower(),
+        )
+
+    async def submit(self, item):
+        """Queue one item for the next batch and wait for its result."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        # Queues and tasks belong to one loop; start a fresh worker per loop
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._loop is not loop or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # Drop callers that gave up while queued
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            try:
+                results = await asyncio.to_thread(self.batch_fn, [item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,190 @@
+"""
+Long-lived Playwright Chromium pool for JS-rendered fetches.
+
+One browser is launched per event loop (in practice, per worker process)
+and reused across fetches, with a small set of browser contexts handed
+out round-robin and a semaphore capping concurrent pages. A browser is
+retired after recycle_after pages or as soon as it disconnects (crash,
+OOM kill); new pages go to a fresh browser while the old one finishes
+its in-flight pages. Images, fonts and media are aborted at the network
+layer since only the DOM is needed.
+
+Playwright objects belong to the loop that started them, so a pool used
+from several loops keeps a separate driver and browser for each. Code
+that runs its own short-lived loop should await close() before the loop
+ends.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+
+
+class _Browser:
+    """A launched browser plus its contexts and usage counters."""
+
+    def __init__(self, browser, contexts):
+        self.browser = browser
+        self.contexts = contexts
+        self.next_context = itertools.cycle(contexts)
+        self.active = 0
+        self.served = 0
+        self.retired = False
+        self.closed = False
+
+    @property
+    def usable(self) -> bool:
+        return not self.retired and self.browser.is_connected()
+
+
+class _LoopState:
+    """One event loop's Playwright driver, current browser and limits."""
+
+    def __init__(self, max_pages: int):
+        self.playwright = None
+        self.current = None
+        self.lock = asyncio.Lock()
+        self.semaphore = asyncio.Semaphore(max_pages)
+
+
+class BrowserPool:
+    def __init__(self, max_pages: int = 4, contexts: int = 2, recycle_after: int = 200,
+                 blocked_resource_types=BLOCKED_RESOURCE_TYPES):
+        self.max_pages = max_pages
+        self.context_count = contexts
+        self.recycle_after = recycle_after
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+        self.launches = 0
+        # event loop -> _LoopState; an entry goes away with its loop
+        self._states = weakref.WeakKeyDictionary()
+        self._states_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "BrowserPool":
+        return cls(
+            max_pages=int(os.environ.get("BROWSER_MAX_PAGES", 4)),
+            contexts=int(os.environ.get("BROWSER_CONTEXTS", 2)),
+            recycle_after=int(os.environ.get("BROWSER_RECYCLE_AFTER", 200)),
+        )
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a fresh page in a pooled context; it is closed on exit."""
+        state = self._state()
+        async with state.semaphore:
+            holder = await self._acquire(state)
+            holder.active += 1
+            page = None
+            try:
+                page = await next(holder.next_context).new_page()
+                yield page
+            finally:
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception as e:
+                        logger.warning(f"Page close failed: {e}")
+                holder.active -= 1
+                holder.served += 1
+                if holder.served >= self.recycle_after:
+                    holder.retired = True
+                if not holder.usable and holder.active == 0:
+                    await self._close_browser(holder)
+
+    async def close(self) -> None:
+        """Close the running loop's browser and stop its driver; other loops keep theirs."""
+        with self._states_lock:
+            state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is None:
+            return
+        if state.current is not None:
+            await self._close_browser(state.current)
+        if state.playwright is not None:
+            await state.playwright.stop()
+
+    def stats(self) -> dict:
+        with self._states_lock:
+            holders = [state.current for state in self._states.values() if state.current is not None]
+        return {
+            "launches": self.launches,
+            "browsers": len(holders),
+            "active_pages": sum(holder.active for holder in holders),
+            "served_by_current": sum(holder.served for holder in holders),
+            "max_pages": self.max_pages,
+            "recycle_after": self.recycle_after,
+        }
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            with self._states_lock:
+                state = self._states.get(loop)
+                if state is None:
+                    state = self._states[loop] = _LoopState(self.max_pages)
+        return state
+
+    async def _acquire(self, state: _LoopState) -> _Browser:
+        async with state.lock:
+            if state.current is None or not state.current.usable:
+                previous = state.current
+                state.current = await self._launch(state)
+                # Retired browsers with nothing in flight can go now
+                if previous is not None and previous.active == 0:
+                    await self._close_browser(previous)
+            return state.current
+
+    async def _launch(self, state: _LoopState) -> _Browser:
+        if state.playwright is None:
+            # Imported on first launch so plain HTTP fetches never load Playwright
+            from playwright.async_api import async_playwright
+
+            state.playwright = await async_playwright().start()
+        browser = await state.playwright.chromium.launch(
+            headless=True,
+            args=["--disable-dev-shm-usage", "--disable-gpu"],
+        )
+        contexts = []
+        for _ in range(self.context_count):
+            context = await browser.new_context()
+            if self.blocked_resource_types:
+                await context.route("**/*", self._route)
+            contexts.append(context)
+        holder = _Browser(browser, contexts)
+        browser.on("disconnected", lambda _: logger.warning("Pooled Chromium disconnected; will relaunch"))
+        self.launches += 1
+        logger.info(f"Launched pooled Chromium #{self.launches}")
+        return holder
+
+    async def _route(self, route) -> None:
+        if route.request.resource_type in self.blocked_resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _close_browser(self, holder: _Browser) -> None:
+        holder.retired = True
+        if holder.closed:
+            return
+        holder.closed = True
+        try:
+            await holder.browser.close()
+        except Exception as e:
+            logger.warning(f"Browser close failed: {e}")
+
+
+_pool = None
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide browser pool shared by all fetchers."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool.from_env()
+    return _pool
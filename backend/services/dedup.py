@@ -0,0 +1,189 @@
+"""
+Idempotency index for at-least-once webhook deliveries.
+
+Eventarc (Ce-Id) and Stripe (event id) may deliver the same event more
+than once. EventDeduplicator claims an event when its handling starts,
+in the same locked step that checks for it, so concurrent redeliveries
+cannot both run. Each event is "pending" while a delivery is being
+handled and "done" once it answered 2xx; a failed delivery is forgotten
+again so the sender's retry is processed, and a pending claim older than
+claim_ttl (its worker crashed or was killed mid-handler) can be taken
+over by a redelivery.
+
+With a SQLite path, claims survive restarts and are shared between
+workers, so a redelivery that lands on another worker while the first is
+still handling the event is seen as pending there too. A bounded LRU of
+ids already done answers the common quick redelivery without touching
+the store. Without a path, claims live in that LRU only; nothing is ever
+reported as a duplicate on a guess.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services.sqlite_conn import ProcessConnection
+
+# claim() results
+CLAIMED = "claimed"
+PENDING = "pending"
+DONE = "done"
+
+
+class EventDeduplicator:
+    def __init__(self, lru_size: int = 10000, path: str = None, retention_days: float = 7, claim_ttl: float = 300):
+        self.lru_size = lru_size
+        # key -> (status, claimed_at); with a store, only "done" keys are kept here
+        self._recent = OrderedDict()
+        # This process's own claims: key -> claimed_at, which identifies the claim in the store
+        self._claims = {}
+        self._lock = threading.Lock()
+        self.retention_days = retention_days
+        self.claim_ttl = claim_ttl
+        # Connects on first use, in each worker process
+        self._store = ProcessConnection(path, self._setup) if path else None
+        self.checked = 0
+        self.duplicates = 0
+        self.store_hits = 0
+        self.reclaimed = 0
+
+    @classmethod
+    def from_env(cls) -> "EventDeduplicator":
+        return cls(
+            lru_size=int(os.environ.get("EVENT_DEDUP_LRU", 10000)),
+            path=os.environ.get("EVENT_DEDUP_PATH") or None,
+            retention_days=float(os.environ.get("EVENT_DEDUP_RETENTION_DAYS", 7)),
+            claim_ttl=float(os.environ.get("EVENT_DEDUP_CLAIM_TTL", 300)),
+        )
+
+    def claim(self, namespace: str, event_id: str) -> str:
+        """
+        Claim an event for handling. Returns CLAIMED if this delivery should run it
+        (then call complete() or unmark()), PENDING if another delivery is handling
+        it right now, or DONE if it was already handled.
+        """
+        key = f"{namespace}:{event_id}"
+        now = time.time()
+        with self._lock:
+            self.checked += 1
+            recent = self._recent.get(key)
+            if recent is not None and (recent[0] == DONE or self._store is None):
+                self._recent.move_to_end(key)
+                status, claimed_at = recent
+                if status == DONE or now - claimed_at <= self.claim_ttl:
+                    self.duplicates += 1
+                    return status
+                self.reclaimed += 1
+            elif self._store is not None:
+                status = self._claim_in_store(key, now)
+                if status != CLAIMED:
+                    self.store_hits += 1
+                    self.duplicates += 1
+                    if status == DONE:
+                        self._remember(key, DONE, now)
+                    return status
+            if self._store is None:
+                self._remember(key, PENDING, now)
+            self._claims[key] = now
+            return CLAIMED
+
+    def check_and_mark(self, namespace: str, event_id: str) -> bool:
+        """True if the event is already handled or being handled; otherwise claim it and return False."""
+        return self.claim(namespace, event_id) != CLAIMED
+
+    def is_pending(self, namespace: str, event_id: str) -> bool:
+        """True while a delivery of this event (in any worker sharing the store) is being handled."""
+        key = f"{namespace}:{event_id}"
+        with self._lock:
+            if self._store is None:
+                recent = self._recent.get(key)
+                return recent is not None and recent[0] == PENDING and time.time() - recent[1] <= self.claim_ttl
+            row = self._db.execute("SELECT status, seen_at FROM seen_events WHERE key = ?", (key,)).fetchone()
+            return row is not None and row[0] == PENDING and time.time() - row[1] <= self.claim_ttl
+
+    def complete(self, namespace: str, event_id: str) -> None:
+        """The event was handled successfully; redeliveries stay rejected."""
+        key = f"{namespace}:{event_id}"
+        now = time.time()
+        with self._lock:
+            self._claims.pop(key, None)
+            self._remember(key, DONE, now)
+            if self._store is not None:
+                self._db.execute("UPDATE seen_events SET status = ?, seen_at = ? WHERE key = ?", (DONE, now, key))
+                self._db.commit()
+
+    def unmark(self, namespace: str, event_id: str) -> None:
+        """Handling failed: forget the event so the sender's retry is processed."""
+        key = f"{namespace}:{event_id}"
+        with self._lock:
+            claimed_at = self._claims.pop(key, None)
+            self._recent.pop(key, None)
+            if self._store is not None and claimed_at is not None:
+                # Only our own claim: after claim_ttl another delivery may have taken it over
+                self._db.execute(
+                    "DELETE FROM seen_events WHERE key = ? AND status = ? AND seen_at = ?", (key, PENDING, claimed_at)
+                )
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+                "duplicate_rate": self.duplicates / self.checked if self.checked else 0.0,
+                "recent": len(self._recent),
+                "in_progress": len(self._claims),
+                "store_hits": self.store_hits,
+                "reclaimed": self.reclaimed,
+                "persistent": self._store is not None,
+            }
+
+    def _claim_in_store(self, key: str, now: float) -> str:
+        # Caller holds the lock. One write transaction, so workers sharing the file cannot both claim
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT status, seen_at FROM seen_events WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                db.execute("INSERT INTO seen_events (key, seen_at, status) VALUES (?, ?, ?)", (key, now, PENDING))
+                status = CLAIMED
+            elif row[0] == PENDING and now - row[1] > self.claim_ttl:
+                # The worker handling it died without finishing; take the claim over
+                db.execute("UPDATE seen_events SET seen_at = ? WHERE key = ?", (now, key))
+                self.reclaimed += 1
+                status = CLAIMED
+            else:
+                status = row[0]
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return status
+
+    def _remember(self, key: str, status: str, claimed_at: float) -> None:
+        # Caller holds the lock
+        self._recent[key] = (status, claimed_at)
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.lru_size:
+            self._recent.popitem(last=False)
+
+    @property
+    def _db(self):
+        # Caller holds the lock
+        return self._store.get()
+
+    def _setup(self, db) -> None:
+        # Runs on first use under the caller's lock
+        db.execute("CREATE TABLE IF NOT EXISTS seen_events (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        columns = [row[1] for row in db.execute("PRAGMA table_info(seen_events)")]
+        if "status" not in columns:
+            # Stores written before claims had a status only held finished events
+            db.execute(f"ALTER TABLE seen_events ADD COLUMN status TEXT NOT NULL DEFAULT '{DONE}'")
+        # Senders stop redelivering after a few days; older ids are dead weight
+        db.execute("DELETE FROM seen_events WHERE seen_at < ?", (time.time() - self.retention_days * 86400,))
+        db.commit()
+        recent = db.execute(
+            "SELECT key, seen_at FROM seen_events WHERE status = ? ORDER BY seen_at DESC LIMIT ?", (DONE, self.lru_size)
+        )
+        for key, seen_at in reversed(recent.fetchall()):
+            self._remember(key, DONE, seen_at)
@@ -0,0 +1,110 @@
+"""
+Shared async download layer for the verification and OCR services.
+
+One pooled httpx client per event loop, a semaphore bounding concurrent
+fetches, a hard cap on response size, and image decoding pushed to a
+worker thread so the loop never blocks on I/O or PIL.
+"""
+import asyncio
+import io
+import logging
+import os
+import threading
+import weakref
+
+import httpx
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+class AsyncDownloader:
+    def __init__(self, max_concurrency: int = 8, max_bytes: int = DEFAULT_MAX_BYTES, timeout: float = 15.0):
+        self.max_concurrency = max_concurrency
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # event loop -> (httpx client, semaphore); an entry goes away with its loop
+        self._pools = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AsyncDownloader":
+        return cls(
+            max_concurrency=int(os.environ.get("DOWNLOAD_MAX_CONCURRENCY", 8)),
+            max_bytes=int(os.environ.get("DOWNLOAD_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            timeout=float(os.environ.get("DOWNLOAD_TIMEOUT", 15)),
+        )
+
+    def _pool(self) -> tuple:
+        """The running loop's (client, semaphore); both are bound to the loop that first uses them."""
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(loop)
+                if pool is None:
+                    # Forget clients of loops that have since closed; their sockets went with the loop
+                    for closed in [other for other in self._pools if other.is_closed()]:
+                        del self._pools[closed]
+                    client = httpx.AsyncClient(
+                        timeout=self.timeout,
+                        follow_redirects=True,
+                        limits=httpx.Limits(
+                            max_connections=self.max_concurrency,
+                            max_keepalive_connections=self.max_concurrency,
+                        ),
+                    )
+                    pool = self._pools[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+        return pool
+
+    async def fetch(self, url: str) -> bytes:
+        """Download url into memory, refusing bodies larger than max_bytes."""
+        client, semaphore = self._pool()
+        async with semaphore:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                declared = int(response.headers.get("Content-Length") or 0)
+                if declared > self.max_bytes:
+                    raise DownloadError(f"{url} is {declared} bytes, limit is {self.max_bytes}")
+
+                buffer = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buffer.extend(chunk)
+                    if len(buffer) > self.max_bytes:
+                        raise DownloadError(f"{url} exceeds {self.max_bytes} bytes")
+                return bytes(buffer)
+
+    async def fetch_all(self, urls: list) -> list:
+        """Download several URLs concurrently, preserving order."""
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+    async def fetch_image(self, url: str) -> Image.Image:
+        data = await self.fetch(url)
+        return await asyncio.to_thread(decode_image, data)
+
+    async def aclose(self) -> None:
+        """Close the running loop's client; other loops keep theirs."""
+        with self._lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool[0].aclose()
+
+
+def decode_image(data: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+
+_downloader = None
+
+def get_downloader() -> AsyncDownloader:
+    """Process-wide downloader shared by all services."""
+    global _downloader
+    if _downloader is None:
+        _downloader = AsyncDownloader.from_env()
+    return _downloader
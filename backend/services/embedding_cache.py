@@ -0,0 +1,124 @@
+"""
+Content-addressed cache for face embeddings.
+
+Entries are keyed by a SHA-256 of the raw image bytes together with the
+model version, so the same ID document checked against several selfie
+retries is detected and embedded only once. A bounded in-memory LRU tier
+sits in front of an optional on-disk tier of .npy files.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from services import metrics
+
+LOOKUPS = metrics.counter("embedding_cache_lookups_total", "Face embedding cache lookups by result", ("result",))
+ENTRIES = metrics.gauge("embedding_cache_entries", "Face embeddings held in the in-memory cache tier")
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = 1024, disk_dir: str = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        """Build a cache from FACE_CACHE_SIZE / FACE_CACHE_DIR."""
+        return cls(
+            max_entries=int(os.environ.get("FACE_CACHE_SIZE", 1024)),
+            disk_dir=os.environ.get("FACE_CACHE_DIR") or None,
+        )
+
+    @staticmethod
+    def key(image_bytes: bytes, model_version: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(model_version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """Return the cached embedding for key, or None on a miss."""
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                LOOKUPS.inc(result="memory_hit")
+                return embedding
+
+        embedding = self._read_disk(key)
+        with self._lock:
+            if embedding is None:
+                self.misses += 1
+                LOOKUPS.inc(result="miss")
+                return None
+            self.disk_hits += 1
+            LOOKUPS.inc(result="disk_hit")
+            self._remember(key, embedding)
+        return embedding
+
+    def put(self, key: str, embedding: np.ndarray) -> None:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, embedding)
+        self._write_disk(key, embedding)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, embedding: np.ndarray) -> None:
+        # Caller holds the lock
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        ENTRIES.set(len(self._entries))
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directory listings small
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npy")
+
+    def _read_disk(self, key: str):
+        if not self.disk_dir:
+            return None
+        try:
+            return np.load(self._path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, embedding: np.ndarray) -> None:
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, embedding, allow_pickle=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,183 @@
+"""
+Persistent 1:N face embedding index for duplicate-identity checks.
+
+Embeddings live in a flat, memory-mapped float32 matrix (one L2-normalized
+row per enrolled face) with a parallel fixed-width id column, so search is
+a chunked matrix-vector product over pages the OS already has cached and
+nothing is materialized as Python objects. New faces are appended in place.
+
+gunicorn workers share the files, so every read or append happens under
+an flock on index.lock, and the row count is re-read from the file sizes
+each time: a face enrolled by one worker is seen by the next search in
+any other.
+"""
+import contextlib
+import fcntl
+import os
+import threading
+
+import numpy as np
+
+ID_BYTES = 64
+# Rows scored per matmul; bounds temporary memory to CHUNK_ROWS floats
+CHUNK_ROWS = 65536
+
+
+class FaceIndex:
+    def __init__(self, directory: str, dim: int = 512):
+        self.directory = directory
+        self.dim = dim
+        self._vectors_path = os.path.join(directory, "embeddings.f32")
+        self._ids_path = os.path.join(directory, "ids.bin")
+        self._lock_path = os.path.join(directory, "index.lock")
+        # Threads of one process share a lock file descriptor, so they also take this
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._lock_pid = None
+        self._vectors = None
+        self._ids = None
+        self._mapped = 0
+        os.makedirs(directory, exist_ok=True)
+        with self._locked(fcntl.LOCK_EX):
+            self._recover()
+
+    @classmethod
+    def from_env(cls):
+        """Build the index from FACE_INDEX_DIR, or return None when unset."""
+        directory = os.environ.get("FACE_INDEX_DIR")
+        return cls(directory) if directory else None
+
+    def __len__(self) -> int:
+        with self._locked(fcntl.LOCK_SH):
+            return self._rows()
+
+    @contextlib.contextmanager
+    def _locked(self, operation: int):
+        with self._lock:
+            if self._lock_pid != os.getpid():
+                # flock is held per open file, so a forked worker needs its own
+                self._lock_fd = os.open(self._lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _rows(self) -> int:
+        # Caller holds the lock, so no append is half-written
+        return min(os.path.getsize(self._vectors_path) // (self.dim * 4), os.path.getsize(self._ids_path) // ID_BYTES)
+
+    def _recover(self) -> None:
+        # Caller holds the exclusive lock. A crash between the two appends leaves one file a row ahead; trim it
+        for path in (self._vectors_path, self._ids_path):
+            if not os.path.exists(path):
+                open(path, "wb").close()
+        count = self._rows()
+        os.truncate(self._vectors_path, count * self.dim * 4)
+        os.truncate(self._ids_path, count * ID_BYTES)
+
+    def add(self, identity_id: str, embedding) -> None:
+        """Append one face for identity_id."""
+        encoded, vector = self._prepare(identity_id, embedding)
+        with self._locked(fcntl.LOCK_EX):
+            self._append(encoded, vector)
+
+    def search_and_add(self, identity_id: str, embedding, k: int = 5, threshold: float = None) -> list:
+        """
+        Search for other identities' faces matching embedding and enroll it only if
+        none is found, as one step: concurrent enrollments of the same face under
+        different ids, in any worker, cannot both miss each other. A face the
+        identity already has enrolled (at threshold) is not added again.
+        Returns the matches, as search().
+        """
+        encoded, vector = self._prepare(identity_id, embedding)
+        with self._locked(fcntl.LOCK_EX):
+            mapped = self._map()
+            matches = self._search(*mapped, vector, k, threshold, identity_id)
+            if not matches and not self._enrolled(*mapped, vector, encoded, threshold):
+                self._append(encoded, vector)
+        return matches
+
+    def search(self, embedding, k: int = 5, threshold: float = None, exclude_identity: str = None) -> list:
+        """
+        Top-k enrolled faces by cosine similarity to embedding.
+        Returns [{"identity_id", "similarity"}], best first.
+        """
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        with self._locked(fcntl.LOCK_SH):
+            vectors, ids, count = self._map()
+        # Rows are only ever appended, so the mapped prefix stays valid after the lock is released
+        return self._search(vectors, ids, count, query, k, threshold, exclude_identity)
+
+    def _prepare(self, identity_id: str, embedding) -> tuple:
+        encoded = identity_id.encode("utf-8")
+        if not encoded or len(encoded) > ID_BYTES:
+            raise ValueError(f"identity_id must be 1-{ID_BYTES} bytes")
+        vector = _normalize(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"expected {self.dim}-d embedding, got {vector.shape[0]}")
+        return encoded, vector
+
+    def _append(self, encoded: bytes, vector: np.ndarray) -> None:
+        # Caller holds the lock
+        with open(self._vectors_path, "ab") as f:
+            f.write(vector.tobytes())
+        with open(self._ids_path, "ab") as f:
+            f.write(encoded.ljust(ID_BYTES, b"\0"))
+
+    @staticmethod
+    def _search(vectors, ids, count: int, query: np.ndarray, k: int, threshold: float, exclude_identity: str) -> list:
+        if count == 0 or k <= 0:
+            return []
+        excluded = exclude_identity.encode("utf-8") if exclude_identity else None
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, count, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, count)
+            scores = vectors[start:stop] @ query
+            if excluded is not None:
+                scores[ids[start:stop] == excluded] = -np.inf
+            if threshold is not None:
+                keep = np.flatnonzero(scores >= threshold)
+            elif scores.shape[0] > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+            else:
+                keep = np.arange(scores.shape[0])
+            best_rows = np.concatenate([best_rows, keep + start])
+            best_scores = np.concatenate([best_scores, scores[keep]])
+            if best_scores.shape[0] > k:
+                top = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[top], best_scores[top]
+
+        order = np.argsort(-best_scores)
+        return [
+            {"identity_id": ids[row].decode("utf-8"), "similarity": float(score)}
+            for row, score in zip(best_rows[order], best_scores[order])
+            if np.isfinite(score)
+        ]
+
+    @staticmethod
+    def _enrolled(vectors, ids, count: int, query: np.ndarray, encoded: bytes, threshold: float) -> bool:
+        """True if the identity has a face scoring at least threshold (any face when threshold is None)."""
+        for start in range(0, count, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, count)
+            own = np.flatnonzero(ids[start:stop] == encoded)
+            if own.size and (threshold is None or (vectors[start:stop][own] @ query).max() >= threshold):
+                return True
+        return False
+
+    def _map(self):
+        # Caller holds the lock. Re-map only when appends (from any worker) have grown the files
+        count = self._rows()
+        if count and self._mapped != count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+            self._ids = np.memmap(self._ids_path, dtype=f"S{ID_BYTES}", mode="r", shape=(count,))
+            self._mapped = count
+        return self._vectors, self._ids, count
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
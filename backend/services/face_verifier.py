@@ -1,51 +1,148 @@
 from facenet_pytorch import InceptionResnetV1, extract_face
 import torch
 from PIL import Image
-import requests
+import asyncio
 import io
 
+from services import metrics
+from services.batching import MicroBatcher
+from services.downloader import AsyncDownloader, get_downloader
+from services.embedding_cache import EmbeddingCache
+from services.face_index import FaceIndex
+from services.inference_backend import optimize_model, select_backend
+
+# Bump when the weights or preprocessing change so stale embeddings are not reused
+MODEL_VERSION = "inception_resnet_v1/vggface2/v1"
+
+# Stricter than the 1:1 match threshold: false positives grow with index size
+DUPLICATE_THRESHOLD = 0.7
+
 class FaceVerifier:
-    def __init__(self):
+    def __init__(self, cache: EmbeddingCache = None, downloader: AsyncDownloader = None, index: FaceIndex = None,
+                 backend: str = None):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
-    
-    async def verify_face(self, id_image_url: str, selfie_url: str) -> dict:
+        self.backend = backend or select_backend("FACE")
+        self.model = optimize_model(
+            InceptionResnetV1(pretrained='vggface2').eval(),
+            self.backend,
+            self.device,
+            example_inputs=torch.zeros(1, 3, 160, 160),
+        )
+        # Quantized embeddings drift slightly from fp32, so cache them separately
+        self.model_version = f"{MODEL_VERSION}/{self.backend}"
+        self.cache = cache if cache is not None else EmbeddingCache.from_env()
+        self.downloader = downloader or get_downloader()
+        self.index = index if index is not None else FaceIndex.from_env()
+        self.batcher = MicroBatcher.from_env(self._embed_batch, "FACE", max_batch_size=16)
+
+    async def embed(self, image_bytes: bytes):
+        """
+        Return the face embedding for raw image bytes, or None if no face is found.
+        Cached by content hash, so repeated images skip detection and the forward pass.
+        """
+        key = EmbeddingCache.key(image_bytes, self.model_version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return torch.from_numpy(cached).unsqueeze(0)
+
+        # Decode and detect off the event loop, then join the next forward batch
+        with metrics.timed("face", "detect"):
+            face = await asyncio.to_thread(self._detect, image_bytes)
+        if face is None:
+            return None
+        embedding = await self.batcher.submit(face)
+
+        self.cache.put(key, embedding.squeeze(0).numpy())
+        return embedding
+
+    def _detect(self, image_bytes: bytes):
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+
+        # Extract face (assumes single face per image)
+        # define keep_all=False (default) to get single face or None
+        return extract_face(image, keep_all=False, device=self.device)
+
+    def _embed_batch(self, faces: list) -> list:
+        with metrics.timed("face", "embed"), torch.no_grad():
+            embeddings = self.model(torch.stack(faces).to(self.device)).cpu()
+        return [embedding.unsqueeze(0) for embedding in embeddings]
+
+    async def verify_face(self, id_image_url: str, selfie_url: str, identity_id: str = None) -> dict:
         """
         Compare face on ID with selfie.
         Returns: match (bool), confidence (0-1).
+        With identity_id and an index configured, a matched face is also checked
+        against every enrolled identity and enrolled if no duplicate is found
+        (repeat checks of an identity do not enroll the same face again).
         """
         try:
-            # Download images
-            id_response = requests.get(id_image_url, stream=True)
-            selfie_response = requests.get(selfie_url, stream=True)
-            
-            id_image = Image.open(id_response.raw).convert('RGB')
-            selfie = Image.open(selfie_response.raw).convert('RGB')
-            
-            # Extract faces (assumes single face per image)
-            # define keep_all=False (default) to get single face or None
-            id_face = extract_face(id_image, keep_all=False, device=self.device)
-            selfie_face = extract_face(selfie, keep_all=False, device=self.device)
-            
-            if id_face is None or selfie_face is None:
+            # Download both images concurrently
+            with metrics.timed("face", "download"):
+                id_bytes, selfie_bytes = await self.downloader.fetch_all([id_image_url, selfie_url])
+
+            # Both faces typically land in the same forward batch
+            id_embedding, selfie_embedding = await asyncio.gather(
+                self.embed(id_bytes),
+                self.embed(selfie_bytes),
+            )
+
+            if id_embedding is None or selfie_embedding is None:
                 return {"status": "error", "message": "Face detection failed in one or both images"}
 
-            # Generate embeddings
-            with torch.no_grad():
-                id_embedding = self.model(id_face.unsqueeze(0).to(self.device))
-                selfie_embedding = self.model(selfie_face.unsqueeze(0).to(self.device))
-            
             # Cosine similarity
             similarity = torch.nn.functional.cosine_similarity(id_embedding, selfie_embedding).item()
-            
+
             # 0.6+ = match (FaceNet standard)
             match = similarity >= 0.6
-            
-            return {
+
+            result = {
                 "status": "success",
                 "match": match,
                 "confidence": float(similarity),
                 "threshold": 0.6
             }
+
+            if match and identity_id and self.index is not None:
+                with metrics.timed("face", "index_search"):
+                    duplicates = await asyncio.to_thread(self._check_and_enroll, identity_id, selfie_embedding)
+                result["duplicates"] = duplicates
+                result["duplicate_threshold"] = DUPLICATE_THRESHOLD
+
+            return result
         except Exception as e:
             return {"status": "error", "message": str(e)}
+
+    async def find_duplicates(self, image_url: str, exclude_identity: str = None, k: int = 5) -> dict:
+        """
+        Search the enrolled index for faces matching the image.
+        Returns: duplicates [{identity_id, similarity}] above DUPLICATE_THRESHOLD.
+        """
+        if self.index is None:
+            return {"status": "error", "message": "Face index not configured (FACE_INDEX_DIR)"}
+        try:
+            with metrics.timed("face", "download"):
+                image_bytes = await self.downloader.fetch(image_url)
+            embedding = await self.embed(image_bytes)
+            if embedding is None:
+                return {"status": "error", "message": "Face detection failed"}
+
+            with metrics.timed("face", "index_search"):
+                duplicates = await asyncio.to_thread(
+                    self.index.search, embedding.numpy(), k, DUPLICATE_THRESHOLD, exclude_identity
+                )
+            return {
+                "status": "success",
+                "duplicates": duplicates,
+                "threshold": DUPLICATE_THRESHOLD,
+                "indexed": len(self.index)
+            }
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def _check_and_enroll(self, identity_id: str, embedding) -> list:
+        # Flagged faces stay out of the index until reviewed
+        return self.index.search_and_add(identity_id, embedding.numpy(), k=5, threshold=DUPLICATE_THRESHOLD)
+
+    def cache_stats(self) -> dict:
+        """Embedding cache hit/miss counters, for sizing FACE_CACHE_SIZE."""
+        return self.cache.stats()
@@ -0,0 +1,403 @@
+"""
+Resumable business harvest engine.
+
+Each (city, state, industry) is one harvest job with its own crawl
+frontier, visit log and lead table, checkpointed to a JSON file so a
+restarted or preempted instance picks up where it stopped. Pages are
+fetched with URLFetcher.fetch_many (streamed, size-capped extraction,
+per-host politeness) and leads are de-duplicated by normalized phone,
+email, domain or business name. Re-harvesting a job only re-queues pages whose
+last fetch is older than stale_after.
+
+Point HARVEST_STATE_DIR at durable storage (e.g. a GCS volume mount on
+Cloud Run) for checkpoints to survive instance replacement. A lease file
+per job keeps two runs from working on the same job at once: it is taken
+when the job is queued, under a token unique to that run, and the running
+worker renews it every lease_seconds / 3, however slow its pages are.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from services.url_fetcher import URLFetcher
+
+logger = logging.getLogger(__name__)
+
+# Words that do not distinguish one business from another
+NAME_NOISE = {"inc", "llc", "ltd", "co", "corp", "company", "the", "and", "of"}
+# Page titles that say nothing about which business it is
+GENERIC_NAMES = {"home", "home page", "contact", "contact us", "about", "about us", "welcome", "services"}
+# A page listing more phones than this is a directory, not a business site
+MAX_PHONES_PER_BUSINESS = 3
+
+
+class HarvestBusy(Exception):
+    pass
+
+
+def normalize_domain(url: str) -> str:
+    host = urlsplit(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_name(name: str) -> str:
+    words = re.sub(r"[^a-z0-9 ]", " ", (name or "").lower()).split()
+    return " ".join(word for word in words if word not in NAME_NOISE)
+
+
+def business_keys(lead: dict) -> list:
+    """
+    Every key this lead can be matched on, strongest first. The domain is
+    only a key for leads with no phone or email, since directory sites
+    host many businesses under one domain.
+    """
+    keys = [f"phone:{phone}" for phone in lead.get("phones", []) if len(phone) == 10]
+    keys += [f"email:{email}" for email in lead.get("emails", [])]
+    if not keys and lead.get("domain"):
+        keys.append(f"domain:{lead['domain']}")
+    name = normalize_name(lead.get("name"))
+    if name and name not in GENERIC_NAMES:
+        keys.append(f"name:{name}")
+    return keys
+
+
+class HarvestEngine:
+    def __init__(self, state_dir: str, max_pages: int = 500, max_depth: int = 1, batch_size: int = 32,
+                 stale_after: float = 7 * 86400, checkpoint_every: int = 25, lease_seconds: float = 300):
+        self.state_dir = state_dir
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+        self.checkpoint_every = checkpoint_every
+        self.lease_seconds = lease_seconds
+        os.makedirs(state_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "HarvestEngine":
+        default = os.path.join(tempfile.gettempdir(), "locale-harvest")
+        return cls(
+            os.environ.get("HARVEST_STATE_DIR", default),
+            max_pages=int(os.environ.get("HARVEST_MAX_PAGES", 500)),
+            max_depth=int(os.environ.get("HARVEST_MAX_DEPTH", 1)),
+            batch_size=int(os.environ.get("HARVEST_BATCH_SIZE", 32)),
+            stale_after=float(os.environ.get("HARVEST_STALE_HOURS", 7 * 24)) * 3600,
+        )
+
+    @staticmethod
+    def job_id(city: str, state: str, industry: str) -> str:
+        return "-".join(re.sub(r"[^a-z0-9]+", "_", part.lower()).strip("_") for part in (city, state, industry))
+
+    # ============================================
+    # JOB LIFECYCLE
+    # ============================================
+
+    def prepare(self, city: str, state: str, industry: str, seed_urls: list) -> dict:
+        """
+        Create or refresh a job: add seeds and re-queue pages that have gone stale.
+        When there is work to do, the job is claimed for one run: pass the returned
+        "lease" to run(), or to release() if the run is not queued after all.
+        Raises HarvestBusy if the job is already queued or running.
+        """
+        job_id = self.job_id(city, state, industry)
+        existing = self._load(job_id)
+        # A queued job whose worker died is resumed by resume-at-startup, not re-triggered
+        if existing is not None and existing["status"] in ("queued", "running"):
+            raise HarvestBusy(f"Harvest {job_id} is already {existing['status']}")
+        lease = self._acquire_lease(job_id)
+        if lease is None:
+            raise HarvestBusy(f"Harvest {job_id} is already running")
+
+        checkpoint = self._load(job_id) or {
+            "job_id": job_id,
+            "city": city,
+            "state": state,
+            "industry": industry,
+            "pending": {},
+            "visited": {},
+            "leads": {},
+            "index": {},
+            "stats": {"pages_fetched": 0, "errors": 0, "runs": 0},
+            "created_at": time.time(),
+        }
+        now = time.time()
+        for url in seed_urls:
+            if now - checkpoint["visited"].get(url, 0) > self.stale_after:
+                checkpoint["pending"].setdefault(url, 0)
+        for url, fetched_at in checkpoint["visited"].items():
+            if now - fetched_at > self.stale_after and len(checkpoint["pending"]) < self.max_pages:
+                checkpoint["pending"].setdefault(url, 0)
+
+        checkpoint["status"] = "queued" if checkpoint["pending"] else "completed"
+        self._save(checkpoint)
+        summary = self._summary(checkpoint)
+        if checkpoint["status"] == "queued":
+            summary["lease"] = lease
+        else:
+            self._release_lease(job_id, lease)
+        return summary
+
+    def status(self, job_id: str):
+        checkpoint = self._load(job_id)
+        return self._summary(checkpoint) if checkpoint else None
+
+    def leads(self, job_id: str):
+        checkpoint = self._load(job_id)
+        return list(checkpoint["leads"].values()) if checkpoint else None
+
+    def claim(self, job_id: str):
+        """
+        Take the job's lease for one run ahead of queueing run(), so workers resuming
+        the same jobs at startup queue each one once. Returns the lease to pass to
+        run(), or None if another run holds it.
+        """
+        return self._acquire_lease(job_id)
+
+    def release(self, job_id: str, lease: str) -> None:
+        """Give up a claim whose run() was never queued; the job is resumed at the next startup."""
+        if not self._holds_lease(job_id, lease):
+            return
+        checkpoint = self._load(job_id)
+        if checkpoint is not None and checkpoint["status"] == "queued":
+            checkpoint["status"] = "paused"
+            self._save(checkpoint)
+        self._release_lease(job_id, lease)
+
+    def incomplete_jobs(self) -> list:
+        """Jobs a previous instance queued, paused or was running when it stopped."""
+        job_ids = []
+        for filename in os.listdir(self.state_dir):
+            if filename.endswith(".json"):
+                checkpoint = self._load(filename[:-5])
+                if checkpoint and checkpoint["status"] in ("queued", "paused", "running"):
+                    job_ids.append(checkpoint["job_id"])
+        return job_ids
+
+    async def run(self, job_id: str, lease: str = None) -> dict:
+        """
+        Crawl the job's frontier to exhaustion, checkpointing as it goes. lease is the
+        claim from prepare() or claim(); without one the job is claimed here.
+        Raises HarvestBusy if another run holds the job.
+        """
+        if lease is None:
+            lease = self._acquire_lease(job_id)
+            if lease is None:
+                raise HarvestBusy(f"Harvest {job_id} is already running")
+        elif not self._renew_lease(job_id, lease):
+            # Waited in the queue past the lease and another worker took the job over
+            raise HarvestBusy(f"Harvest {job_id} was taken over by another worker")
+        checkpoint = self._load(job_id)
+        if checkpoint is None:
+            self._release_lease(job_id, lease)
+            raise ValueError(f"Unknown harvest {job_id}")
+        fetcher = URLFetcher()
+        lease_keeper = asyncio.create_task(self._keep_lease(job_id, lease))
+        try:
+            checkpoint["status"] = "running"
+            checkpoint["stats"]["runs"] += 1
+            checkpoint["run_started_at"] = time.time()
+            checkpoint["run_pages"] = 0
+            checkpoint["run_leads"] = 0
+            self._save(checkpoint)
+
+            since_checkpoint = 0
+            while checkpoint["pending"]:
+                # Pages stay in `pending` until processed, so a preempted batch is retried on resume
+                batch = list(checkpoint["pending"].items())[:self.batch_size]
+                depths = dict(batch)
+                async for result in fetcher.fetch_many(depths, extract=True):
+                    if lease_keeper.done():
+                        # Lease lost (raises HarvestBusy): another worker owns the job now
+                        lease_keeper.result()
+                    self._process(checkpoint, result, depths[result["url"]])
+                    since_checkpoint += 1
+                    if since_checkpoint >= self.checkpoint_every:
+                        self._save(checkpoint)
+                        since_checkpoint = 0
+
+            checkpoint["status"] = "completed"
+            logger.info(f"Harvest {job_id} completed: {checkpoint['stats']['pages_fetched']} pages, "
+                        f"{len(checkpoint['leads'])} leads")
+            return self._summary(checkpoint)
+        except HarvestBusy:
+            # Leave the checkpoint to the worker that holds the lease now
+            raise
+        except Exception as e:
+            checkpoint["status"] = "failed"
+            checkpoint["error"] = str(e)
+            raise
+        finally:
+            lease_keeper.cancel()
+            if self._holds_lease(job_id, lease):
+                self._save(checkpoint)
+                self._release_lease(job_id, lease)
+            await fetcher.aclose()
+
+    async def _keep_lease(self, job_id: str, lease: str) -> None:
+        # Time-based, so a slow batch cannot outlive the lease
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await asyncio.to_thread(self._renew_lease, job_id, lease):
+                logger.warning(f"Harvest {job_id} lost its lease; stopping")
+                raise HarvestBusy(f"Harvest {job_id} was taken over by another worker")
+
+    # ============================================
+    # CRAWL
+    # ============================================
+
+    def _process(self, checkpoint: dict, result: dict, depth: int) -> None:
+        url = result["url"]
+        checkpoint["pending"].pop(url, None)
+        checkpoint["visited"][url] = time.time()
+        checkpoint["run_pages"] += 1
+        if result.get("status") != 200:
+            checkpoint["stats"]["errors"] += 1
+            return
+        checkpoint["stats"]["pages_fetched"] += 1
+
+        phones, emails = result.get("phones", []), result.get("emails", [])
+        if (phones or emails) and len(phones) <= MAX_PHONES_PER_BUSINESS:
+            self._add_lead(checkpoint, {
+                "name": result.get("title") or normalize_domain(url),
+                "phones": phones,
+                "emails": emails,
+                "domain": normalize_domain(url),
+                "url": url,
+            })
+
+        if depth >= self.max_depth:
+            return
+        now = time.time()
+        for link in result.get("links", []):
+            if len(checkpoint["pending"]) + len(checkpoint["visited"]) >= self.max_pages:
+                break
+            if not link.startswith(("http://", "https://")):
+                continue
+            link = link.split("#")[0]
+            if link in checkpoint["pending"] or now - checkpoint["visited"].get(link, 0) <= self.stale_after:
+                continue
+            checkpoint["pending"][link] = depth + 1
+
+    def _add_lead(self, checkpoint: dict, candidate: dict) -> None:
+        keys = business_keys(candidate)
+        index = checkpoint["index"]
+        lead_id = next((index[key] for key in keys if key in index), None)
+        now = time.time()
+        if lead_id is None:
+            lead_id = str(len(checkpoint["leads"]) + 1)
+            checkpoint["leads"][lead_id] = {
+                **candidate,
+                "city": checkpoint["city"],
+                "state": checkpoint["state"],
+                "industry": checkpoint["industry"],
+                "first_seen": now,
+            }
+            checkpoint["run_leads"] += 1
+        else:
+            lead = checkpoint["leads"][lead_id]
+            lead["phones"] = sorted(set(lead["phones"]) | set(candidate["phones"]))
+            lead["emails"] = sorted(set(lead["emails"]) | set(candidate["emails"]))
+        checkpoint["leads"][lead_id]["last_seen"] = now
+        for key in business_keys(checkpoint["leads"][lead_id]):
+            index.setdefault(key, lead_id)
+
+    def _summary(self, checkpoint: dict) -> dict:
+        elapsed = max(time.time() - checkpoint.get("run_started_at", time.time()), 1e-6)
+        running = checkpoint["status"] == "running"
+        return {
+            "job_id": checkpoint["job_id"],
+            "city": checkpoint["city"],
+            "state": checkpoint["state"],
+            "industry": checkpoint["industry"],
+            "status": checkpoint["status"],
+            "pending": len(checkpoint["pending"]),
+            "visited": len(checkpoint["visited"]),
+            "leads": len(checkpoint["leads"]),
+            "pages_fetched": checkpoint["stats"]["pages_fetched"],
+            "errors": checkpoint["stats"]["errors"],
+            "runs": checkpoint["stats"]["runs"],
+            "pages_per_minute": checkpoint.get("run_pages", 0) / elapsed * 60 if running else None,
+            "leads_per_minute": checkpoint.get("run_leads", 0) / elapsed * 60 if running else None,
+            "updated_at": checkpoint.get("updated_at"),
+            "error": checkpoint.get("error"),
+        }
+
+    # ============================================
+    # CHECKPOINTS AND LEASES
+    # ============================================
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.state_dir, job_id + suffix)
+
+    def _load(self, job_id: str):
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, checkpoint: dict) -> None:
+        checkpoint["updated_at"] = time.time()
+        self._write(self._path(checkpoint["job_id"]), checkpoint)
+
+    def _write(self, path: str, data: dict) -> None:
+        # Write-then-rename: a crash mid-write leaves the previous file intact, and readers never see half of one
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _lease(self, token: str) -> dict:
+        return {"owner": token, "pid": os.getpid(), "expires_at": time.time() + self.lease_seconds}
+
+    def _read_lease(self, job_id: str):
+        try:
+            with open(self._path(job_id, ".lease")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _lease_holder(self, job_id: str):
+        lease = self._read_lease(job_id)
+        # An expired lease belongs to a worker that died without releasing it
+        return lease if lease is not None and lease["expires_at"] > time.time() else None
+
+    def _holds_lease(self, job_id: str, token: str) -> bool:
+        """True if the lease file is still this run's, even if it lapsed while the job was queued."""
+        lease = self._read_lease(job_id)
+        return lease is not None and lease.get("owner") == token
+
+    def _acquire_lease(self, job_id: str):
+        """A new lease token for one run of the job, or None while another run holds it."""
+        path = self._path(job_id, ".lease")
+        if os.path.exists(path) and self._lease_holder(job_id) is None:
+            os.remove(path)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        token = uuid.uuid4().hex
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._lease(token), f)
+        return token
+
+    def _renew_lease(self, job_id: str, token: str) -> bool:
+        """Extend this run's lease; False if it lapsed and another run has taken the job."""
+        if not self._holds_lease(job_id, token):
+            return False
+        self._write(self._path(job_id, ".lease"), self._lease(token))
+        return True
+
+    def _release_lease(self, job_id: str, token: str) -> None:
+        if not self._holds_lease(job_id, token):
+            return
+        try:
+            os.remove(self._path(job_id, ".lease"))
+        except OSError:
+            pass
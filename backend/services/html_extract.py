@@ -0,0 +1,109 @@
+"""
+Incremental HTML extraction for streamed fetches.
+
+StreamingExtractor is fed decoded chunks as they arrive and returns what
+it found in each one: the title, visible text, links and contact fields
+(emails and phone numbers from mailto:/tel: links and from the text). Only the
+parser's unconsumed tail and the de-duplication sets are kept between
+chunks, never the document.
+"""
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b")
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+# A text node longer than this is flushed early rather than buffered whole
+MAX_PENDING_TEXT = 64 * 1024
+
+
+class StreamingExtractor(HTMLParser):
+    def __init__(self, base_url: str = ""):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self._skip_depth = 0
+        self._in_title = False
+        self._events = []
+        self._seen = set()
+        # Text nodes can be split across chunks; hold them until the next tag
+        self._pending = []
+        self._pending_size = 0
+
+    def feed(self, chunk: str) -> list:
+        """Parse chunk and return the events it produced as (kind, value) pairs."""
+        super().feed(chunk)
+        events, self._events = self._events, []
+        return events
+
+    def close(self) -> list:
+        super().close()
+        self._flush_text()
+        events, self._events = self._events, []
+        return events
+
+    @property
+    def buffered(self) -> int:
+        """Characters held back waiting for the rest of a tag or text node."""
+        return len(self.rawdata) + self._pending_size
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag != "a":
+            return
+        href = dict(attrs).get("href") or ""
+        if href.startswith("mailto:"):
+            self._emit("email", href[7:].split("?")[0].strip().lower())
+        elif href.startswith("tel:"):
+            self._emit("phone", _normalize_phone(href[4:]))
+        elif href and not href.startswith(("#", "javascript:")):
+            self._emit("link", urljoin(self.base_url, href))
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag == "title":
+            self._in_title = False
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size > MAX_PENDING_TEXT:
+            self._flush_text()
+
+    def _flush_text(self) -> None:
+        if not self._pending:
+            return
+        text = " ".join("".join(self._pending).split())
+        self._pending = []
+        self._pending_size = 0
+        if not text:
+            return
+        if self._in_title:
+            self._emit("title", text)
+            return
+        self._events.append(("text", text))
+        for email in EMAIL_RE.findall(text):
+            self._emit("email", email.lower())
+        for phone in PHONE_RE.findall(text):
+            self._emit("phone", _normalize_phone(phone))
+
+    def _emit(self, kind: str, value: str) -> None:
+        if value and (kind, value) not in self._seen:
+            self._seen.add((kind, value))
+            self._events.append((kind, value))
+
+
+def _normalize_phone(value: str) -> str:
+    digits = re.sub(r"\D", "", value)
+    return digits[1:] if len(digits) == 11 and digits.startswith("1") else digits
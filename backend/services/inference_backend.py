@@ -0,0 +1,169 @@
+"""
+Selectable CPU inference backends for the model-backed services.
+
+- fp32:     eager PyTorch, the accuracy baseline
+- int8:     dynamic int8 quantization of Linear layers (CPU only)
+- compiled: a traced, frozen TorchScript graph when example inputs are
+            given (fixed-graph models such as FaceNet), otherwise
+            torch.compile of forward (generate-driven models such as TrOCR)
+
+Run as a module to check accuracy against fp32 and compare latency and
+resident memory, each backend in its own process:
+
+    python -m services.inference_backend face --images a.jpg b.jpg
+    python -m services.inference_backend ocr --images line1.png line2.png
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import time
+
+from services.metrics import rss_mb
+
+BACKENDS = ("fp32", "int8", "compiled")
+
+
+def select_backend(prefix: str, default: str = "fp32") -> str:
+    """Read <prefix>_BACKEND, e.g. FACE_BACKEND=int8."""
+    backend = os.environ.get(f"{prefix}_BACKEND", default).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"{prefix}_BACKEND must be one of {BACKENDS}, got {backend!r}")
+    return backend
+
+
+def optimize_model(model, backend: str, device, example_inputs=None):
+    """Return model (already in eval mode) prepared for the given backend on device."""
+    import torch
+
+    if backend == "fp32":
+        return model.to(device)
+    if backend == "int8":
+        if device.type != "cpu":
+            raise ValueError("int8 dynamic quantization is only supported on CPU")
+        return torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "compiled":
+        model = model.to(device)
+        if example_inputs is not None:
+            with torch.no_grad():
+                traced = torch.jit.trace(model, example_inputs.to(device))
+            return torch.jit.freeze(traced)
+        model.forward = torch.compile(model.forward, dynamic=True)
+        return model
+    raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+
+# ============================================
+# ACCURACY CHECKS
+# ============================================
+
+def embedding_agreement(baseline: list, candidate: list) -> dict:
+    """Cosine similarity between paired embeddings from two backends."""
+    import numpy as np
+
+    a = np.asarray(baseline, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+def text_agreement(baseline: list, candidate: list) -> dict:
+    """Character error rate of candidate OCR output against the baseline."""
+    errors = sum(_edit_distance(a, b) for a, b in zip(baseline, candidate))
+    chars = sum(len(a) for a in baseline)
+    exact = sum(a == b for a, b in zip(baseline, candidate))
+    return {"cer": errors / chars if chars else 0.0, "exact_match": exact / len(baseline) if baseline else 1.0}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def _run_backend(service: str, backend: str, image_paths: list, repeats: int) -> dict:
+    # Runs in a fresh process so RSS reflects this backend alone
+    import torch
+    from PIL import Image
+
+    baseline_rss = rss_mb()
+    if service == "face":
+        from services.face_verifier import FaceVerifier
+        verifier = FaceVerifier(backend=backend)
+        if image_paths:
+            faces = [verifier._detect(open(path, "rb").read()) for path in image_paths]
+        else:
+            generator = torch.Generator().manual_seed(0)
+            faces = [torch.rand(3, 160, 160, generator=generator) * 2 - 1 for _ in range(8)]
+
+        def run():
+            return [embedding.squeeze(0).tolist() for embedding in verifier._embed_batch(faces)]
+    else:
+        from services.k1_parser import K1Parser
+        parser = K1Parser(backend=backend)
+        pixel_values = [parser._preprocess(Image.open(path).convert("RGB")) for path in image_paths]
+
+        def run():
+            return parser._generate_batch(pixel_values)
+
+    outputs = run()  # warm-up, and the outputs compared for accuracy
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "backend": backend,
+        "outputs": outputs,
+        "latency_ms": {
+            "p50": statistics.median(latencies),
+            "max": max(latencies),
+            "mean": statistics.fmean(latencies),
+        },
+        "rss_mb": rss_mb(),
+        "model_rss_mb": rss_mb() - baseline_rss,
+    }
+
+
+def compare_backends(service: str, image_paths: list, backends=BACKENDS, repeats: int = 10) -> list:
+    """Benchmark each backend in its own process and score it against fp32."""
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(_run_backend, (service, backend, image_paths, repeats)))
+
+    baseline = next((r for r in results if r["backend"] == "fp32"), None)
+    for result in results:
+        if baseline is not None:
+            if service == "face":
+                result["accuracy"] = embedding_agreement(baseline["outputs"], result["outputs"])
+            else:
+                result["accuracy"] = text_agreement(baseline["outputs"], result["outputs"])
+        del result["outputs"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inference backends against the fp32 baseline")
+    parser.add_argument("service", choices=["face", "ocr"])
+    parser.add_argument("--images", nargs="*", default=[], help="Face photos or single-line text crops")
+    parser.add_argument("--backends", nargs="*", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+    if args.service == "ocr" and not args.images:
+        parser.error("ocr needs --images (line crops)")
+    if "fp32" not in args.backends:
+        args.backends.insert(0, "fp32")
+
+    print(json.dumps(compare_backends(args.service, args.images, args.backends, args.repeats), indent=2))
@@ -0,0 +1,265 @@
+"""
+Fast-ack background job pipeline.
+
+Webhooks enqueue typed jobs and return immediately; the work runs later
+on a bounded pool. Each job type is registered as "io" (API calls and
+downloads) or "cpu" (OCR, face and model work). Both kinds run on thread
+pools in this process: model inference releases the GIL, and sharing the
+worker's loaded models avoids a model copy per process and forking a
+process that already runs threads. Each kind has its own bounded pending
+queue, pool size and dispatcher, so a full queue raises QueueFull and the
+caller can reject with a retryable status instead of piling up work.
+Failed jobs are retried with exponential backoff. JobQueue is the local
+stand-in for a Pub/Sub topic and push subscription.
+
+Job state lives in this process only: a job's status is visible from the
+worker that accepted it. Run one web worker per instance (the default)
+when clients poll job status, or move state to a shared store first.
+
+Jobs were acknowledged to their sender when they were queued, so with a
+spool directory the jobs a stopping worker never finished are written
+there by persist_unfinished() and queued again by recover() at the next
+start. A job cut off mid-run runs again from the start.
+"""
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("io", "cpu")
+# States a job never leaves, so it can be dropped from history
+FINISHED = ("succeeded", "failed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, io_workers: int = 8, cpu_workers: int = 2, max_pending: int = 100,
+                 max_attempts: int = 3, backoff_base: float = 1.0, history: int = 10000, spool_dir: str = None):
+        self.workers = {"io": io_workers, "cpu": cpu_workers}
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.history = history
+        self._handlers = {}
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {kind: queue.Queue(maxsize=max_pending) for kind in KINDS}
+        # Caps jobs handed to each executor so its internal queue never grows unbounded
+        self._slots = {kind: threading.BoundedSemaphore(self.workers[kind]) for kind in KINDS}
+        self._executors = {}
+        self._dispatchers = []
+        self._stopping = threading.Event()
+        self.spool_dir = spool_dir
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            io_workers=int(os.environ.get("JOB_IO_WORKERS", 8)),
+            cpu_workers=int(os.environ.get("JOB_CPU_WORKERS", 2)),
+            max_pending=int(os.environ.get("JOB_MAX_PENDING", 100)),
+            max_attempts=int(os.environ.get("JOB_MAX_ATTEMPTS", 3)),
+            backoff_base=float(os.environ.get("JOB_BACKOFF_SECONDS", 1.0)),
+            spool_dir=os.environ.get("JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "locale-jobs")) or None,
+        )
+
+    def register(self, job_type: str, handler, kind: str = "io") -> None:
+        """handler(**payload) -> result dict, called on the kind's thread pool."""
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}")
+        self._handlers[job_type] = (handler, kind)
+
+    def submit(self, job_type: str, payload: dict) -> str:
+        """Enqueue a job and return its id. Raises QueueFull when the backlog is at capacity."""
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        self._ensure_started()
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": job_type,
+            "state": "queued",
+            "attempts": 0,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        kind = self._handlers[job_type][1]
+        # Stored before it is queued, so the dispatcher always finds it
+        with self._lock:
+            self._jobs[job["id"]] = job
+        try:
+            self._pending[kind].put_nowait(job["id"])
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job["id"]]
+            raise QueueFull(f"{kind} job queue is full")
+        with self._lock:
+            self._evict()
+        return job["id"]
+
+    def status(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: value for key, value in job.items() if key != "payload"}
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = {}
+            for job in self._jobs.values():
+                states[job["state"]] = states.get(job["state"], 0) + 1
+        return {
+            "pending": {kind: q.qsize() for kind, q in self._pending.items()},
+            "capacity": {kind: q.maxsize for kind, q in self._pending.items()},
+            "states": states,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop dispatching new jobs; with wait, let running jobs finish."""
+        self._stopping.set()
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def persist_unfinished(self) -> int:
+        """
+        Write every job not yet finished to the spool directory, for recover() in the
+        next worker. Call after shutdown(); returns the number of jobs written.
+        """
+        if not self.spool_dir:
+            return 0
+        with self._lock:
+            unfinished = [dict(job) for job in self._jobs.values() if job["state"] not in FINISHED]
+        for job in unfinished:
+            fd, tmp_path = tempfile.mkstemp(dir=self.spool_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"type": job["type"], "payload": job["payload"], "created_at": job["created_at"]}, f)
+            os.replace(tmp_path, os.path.join(self.spool_dir, job["id"] + ".json"))
+        return len(unfinished)
+
+    def recover(self) -> list:
+        """
+        Queue the jobs a previous worker left in the spool directory and return their new ids.
+        Workers sharing the directory each take a job at most once; jobs that do not fit stay spooled.
+        """
+        if not self.spool_dir:
+            return []
+        job_ids = []
+        for filename in sorted(os.listdir(self.spool_dir)):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.spool_dir, filename)
+            taken = f"{path}.{os.getpid()}"
+            try:
+                # Rename is atomic: of several workers recovering at once, one gets the file
+                os.rename(path, taken)
+            except FileNotFoundError:
+                continue
+            with open(taken) as f:
+                spooled = json.load(f)
+            try:
+                job_ids.append(self.submit(spooled["type"], spooled["payload"]))
+            except (QueueFull, ValueError) as e:
+                os.rename(taken, path)
+                logger.warning(f"Left spooled job {filename} for later: {e}")
+                if isinstance(e, QueueFull):
+                    break
+                continue
+            os.remove(taken)
+        return job_ids
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._dispatchers:
+                return
+            for kind in KINDS:
+                thread = threading.Thread(target=self._dispatch, args=(kind,), name=f"jobs-{kind}", daemon=True)
+                thread.start()
+                self._dispatchers.append(thread)
+
+    def _evict(self) -> None:
+        # Caller holds the lock. Oldest finished jobs first; queued and running ones are never dropped
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        finished = (job_id for job_id, job in self._jobs.items() if job["state"] in FINISHED)
+        for job_id in list(itertools.islice(finished, excess)):
+            del self._jobs[job_id]
+
+    def _executor(self, kind: str):
+        # Created on first use so importing this module starts no threads
+        if kind not in self._executors:
+            self._executors[kind] = ThreadPoolExecutor(max_workers=self.workers[kind], thread_name_prefix=f"jobs-{kind}")
+        return self._executors[kind]
+
+    def _dispatch(self, kind: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                job_id = self._pending[kind].get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+
+            self._slots[kind].acquire()
+            if self._stopping.is_set():
+                # Stays queued for persist_unfinished()
+                self._slots[kind].release()
+                return
+            handler = self._handlers[job["type"]][0]
+            self._update(job, state="running", attempts=job["attempts"] + 1)
+            try:
+                future = self._executor(kind).submit(handler, **job["payload"])
+            except RuntimeError:
+                # Executor shut down underneath us: the job never ran
+                self._slots[kind].release()
+                self._update(job, state="queued", attempts=job["attempts"] - 1)
+                return
+            future.add_done_callback(lambda f, job=job, kind=kind: self._finished(job, kind, f))
+
+    def _finished(self, job: dict, kind: str, future) -> None:
+        self._slots[kind].release()
+        try:
+            result = future.result()
+        except Exception as e:
+            if job["attempts"] < self.max_attempts and self._stopping.is_set():
+                # No retry timer while stopping; persist_unfinished() keeps it for the next worker
+                self._update(job, state="retrying", error=str(e))
+            elif job["attempts"] < self.max_attempts:
+                delay = random.uniform(0.5, 1.0) * self.backoff_base * 2 ** (job["attempts"] - 1)
+                logger.warning(f"Job {job['id']} ({job['type']}) failed, retry in {delay:.1f}s: {e}")
+                self._update(job, state="retrying", error=str(e))
+                timer = threading.Timer(delay, self._requeue, args=(job, kind))
+                timer.daemon = True
+                timer.start()
+            else:
+                logger.error(f"Job {job['id']} ({job['type']}) failed after {job['attempts']} attempts: {e}")
+                self._update(job, state="failed", error=str(e))
+            return
+        self._update(job, state="succeeded", result=result, error=None)
+
+    def _requeue(self, job: dict, kind: str) -> None:
+        # Retries wait for space rather than being dropped
+        self._update(job, state="queued")
+        self._pending[kind].put(job["id"])
+
+    def _update(self, job: dict, **changes) -> None:
+        with self._lock:
+            job.update(changes, updated_at=time.time())
@@ -0,0 +1,77 @@
+"""
+Text-line segmentation for full-page scans.
+
+TrOCR reads one line at a time, so a K-1 page is split into line crops
+before OCR. Segmentation is a projection-profile pass over the binarized
+page: form rules are masked out, ink rows are grouped into bands, and each
+band is split on wide horizontal gaps so side-by-side form fields become
+separate crops. Boxes come back in reading order (top-to-bottom, then
+left-to-right).
+"""
+import numpy as np
+from PIL import Image
+
+
+def segment_lines(image: Image.Image, min_height: int = 6, padding: int = 4, rule_ratio: float = 0.6) -> list:
+    """
+    Return (left, top, right, bottom) boxes for text lines in image.
+    rule_ratio: rows/columns with more ink than this fraction are treated as form rules.
+    """
+    gray = np.asarray(image.convert("L"), dtype=np.uint8)
+    height, width = gray.shape
+    ink = gray < _otsu_threshold(gray)
+
+    # Mask long horizontal and vertical rules so boxes do not merge lines
+    ink[ink.mean(axis=1) > rule_ratio, :] = False
+    ink[:, ink.mean(axis=0) > rule_ratio] = False
+
+    # Ignore specks: a row needs a few inked pixels to count as text
+    min_ink = max(2, width // 500)
+    row_has_ink = ink.sum(axis=1) >= min_ink
+
+    boxes = []
+    for top, bottom in _runs(row_has_ink, max_gap=1):
+        if bottom - top < min_height:
+            continue
+        band = ink[top:bottom]
+        # Gaps wider than ~2 line heights separate fields on the same row
+        column_gap = max(8, 2 * (bottom - top))
+        for left, right in _runs(band.any(axis=0), max_gap=column_gap):
+            if right - left < min_height:
+                continue
+            boxes.append((
+                max(0, left - padding),
+                max(0, top - padding),
+                min(width, right + padding),
+                min(height, bottom + padding),
+            ))
+    return boxes
+
+
+def crop_lines(image: Image.Image, boxes: list) -> list:
+    return [image.crop(box) for box in boxes]
+
+
+def _runs(mask: np.ndarray, max_gap: int = 0) -> list:
+    """[start, stop) spans of True in mask, bridging gaps of up to max_gap."""
+    indices = np.flatnonzero(mask)
+    if indices.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(indices) > max_gap + 1)
+    starts = np.concatenate([[indices[0]], indices[breaks + 1]])
+    stops = np.concatenate([indices[breaks], [indices[-1]]]) + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    levels = np.arange(256)
+    weight_bg = np.cumsum(histogram)
+    weight_fg = total - weight_bg
+    cumulative = np.cumsum(histogram * levels)
+    mean_bg = cumulative / np.maximum(weight_bg, 1)
+    mean_fg = (cumulative[-1] - cumulative) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    # Threshold is "pixel < t is ink", so use the level after the split
+    return int(np.argmax(between)) + 1
@@ -0,0 +1,299 @@
+"""
+Process-local latency histograms, counters and gauges, rendered in
+Prometheus text format for the /metrics route, and this process's memory
+readings.
+
+Services time their internal stages with
+
+    with metrics.timed("face", "detect"):
+        ...
+
+which feeds the shared stage_duration_seconds{service,stage} histogram.
+With METRICS_ENABLED=0, timed() returns a shared no-op context manager
+and inc()/set()/observe() return immediately, so instrumented code costs one
+attribute check. Each gunicorn worker keeps its own registry.
+
+SamplingProfiler is an optional, dependency-free stack sampler for
+finding hot code in a live worker (see /debug/profile).
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+
+ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds; covers cache hits through slow model calls and page renders
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_text(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, labelnames=(), function=None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        # Unlabelled gauges may instead be read from function() at render time
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        if not ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        if self.function is not None:
+            lines.append(f"{self.name} {self.function()}")
+            return lines
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        if not ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> dict:
+        """{label values: {"count", "sum"}} for every series recorded so far."""
+        with self._lock:
+            return {key: {"count": count, "sum": total} for key, (_, total, count) in self._series.items()}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_text(names, key + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames=(), function=None) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames, function=function)
+
+    def histogram(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+            return metric
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds", "Time spent in an internal stage of a backend service", ("service", "stage")
+)
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        import resource
+        # Peak, not current, but the best portable fallback
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def memory_usage() -> dict:
+    """
+    RSS split into memory shared with other processes (e.g. model weights
+    inherited from a preloading parent) and memory private to this one, in MB.
+    PSS charges each shared page fractionally, so it sums correctly across workers.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) / 1024
+    except OSError:
+        return {"rss_mb": round(rss_mb(), 1)}
+    return {
+        "rss_mb": round(fields.get("Rss", 0), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+    }
+
+
+# Read when /metrics is rendered, so it costs nothing between scrapes
+PROCESS_RSS = REGISTRY.gauge(
+    "process_resident_memory_bytes", "Resident memory of this worker", function=lambda: round(rss_mb() * 1024 * 1024)
+)
+
+
+def counter(name: str, help_text: str, labelnames=()) -> Counter:
+    return REGISTRY.counter(name, help_text, labelnames)
+
+
+def gauge(name: str, help_text: str, labelnames=(), function=None) -> Gauge:
+    return REGISTRY.gauge(name, help_text, labelnames, function)
+
+
+def histogram(name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help_text, labelnames, buckets)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("service", "stage", "started")
+
+    def __init__(self, service: str, stage: str):
+        self.service = service
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, service=self.service, stage=self.stage)
+        return False
+
+
+def timed(service: str, stage: str):
+    """Context manager recording the block's wall time as a stage of service (sync or async code)."""
+    return _StageTimer(service, stage) if ENABLED else _NULL_TIMER
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack each interval and tallies them as
+    collapsed stacks ("outer;inner;leaf count"), the input format for
+    flamegraph.pl and speedscope. Only costs anything while running.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
@@ -0,0 +1,112 @@
+"""
+Persistent OCR result cache with in-flight deduplication.
+
+Parsed K-1 results are stored in a local SQLite file keyed by a hash of
+the page bytes plus the model and parser versions, so a re-uploaded
+document returns its stored `extracted` result without touching TrOCR.
+Concurrent parses of the same page share one computation.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from services.sqlite_conn import ProcessConnection
+
+logger = logging.getLogger(__name__)
+
+
+class OcrCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.deduped = 0
+        # Connects on first use, in each worker process
+        self._store = ProcessConnection(path, self._setup)
+
+    @classmethod
+    def from_env(cls) -> "OcrCache":
+        default = os.path.join(tempfile.gettempdir(), "locale-ocr-cache.sqlite")
+        return cls(os.environ.get("OCR_CACHE_PATH", default))
+
+    @property
+    def _db(self):
+        return self._store.get()
+
+    @staticmethod
+    def _setup(db) -> None:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            " key TEXT PRIMARY KEY,"
+            " extracted TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        db.commit()
+
+    @staticmethod
+    def key(page_bytes: bytes, model_version: str, parser_version: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{model_version}\0{parser_version}\0".encode("utf-8"))
+        digest.update(page_bytes)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT extracted FROM ocr_results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, extracted: dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, extracted, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(extracted), time.time()),
+            )
+            self._db.commit()
+
+    async def get_or_compute(self, key: str, compute) -> tuple:
+        """
+        Return (extracted, cached). compute is an async callable run only on a miss;
+        callers arriving while it runs await the same result. The computation is a
+        task owned by the cache, so a caller that is cancelled (client disconnect)
+        only stops waiting; the others still get the result.
+        """
+        # SQLite reads and writes block, so they run off the event loop
+        extracted = await asyncio.to_thread(self.get, key)
+        if extracted is not None:
+            self.hits += 1
+            return extracted, True
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduped += 1
+            return await asyncio.shield(task), True
+
+        self.misses += 1
+        task = asyncio.get_running_loop().create_task(self._compute(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), False
+
+    async def _compute(self, key: str, compute) -> dict:
+        extracted = await compute()
+        await asyncio.to_thread(self.put, key, extracted)
+        return extracted
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the failure so a computation every caller abandoned is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "deduped": self.deduped}
@@ -0,0 +1,49 @@
+"""
+Lazy, page-at-a-time PDF reading for document uploads.
+
+Pages are opened one at a time from a file on disk, so memory stays flat
+regardless of page count. A page whose embedded text layer already has
+enough text is returned as text and never rasterized; otherwise it is
+rendered at the requested DPI for OCR.
+"""
+import threading
+
+import pypdfium2 as pdfium
+
+# PDFium is not thread-safe; serialize calls across concurrent documents
+_PDFIUM_LOCK = threading.Lock()
+
+
+def iter_pages(path: str, dpi: int = 200, min_text_chars: int = 100):
+    """
+    Yield {"page", "text", "image"} per page, in order.
+    Exactly one of text (from the text layer) or image (a PIL render) is set.
+    """
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        page_count = len(pdf)
+    try:
+        for index in range(page_count):
+            with _PDFIUM_LOCK:
+                page = pdf[index]
+                try:
+                    text = _text_layer(page)
+                    if len(text.strip()) >= min_text_chars:
+                        result = {"page": index + 1, "text": text, "image": None}
+                    else:
+                        image = page.render(scale=dpi / 72).to_pil().convert("RGB")
+                        result = {"page": index + 1, "text": None, "image": image}
+                finally:
+                    page.close()
+            yield result
+    finally:
+        with _PDFIUM_LOCK:
+            pdf.close()
+
+
+def _text_layer(page) -> str:
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range()
+    finally:
+        textpage.close()
@@ -0,0 +1,98 @@
+"""
+Response cache for the AI endpoints.
+
+Identical or near-identical prompts ("Find a plumber near me?" vs
+"find  a plumber near me") are answered from memory instead of a model
+call. Normalization is deliberately light (case, whitespace, trailing
+sentence punctuation): punctuation inside a prompt carries meaning
+("C++" vs "C#", "2+2" vs "2-2"). Keys combine the endpoint, the normalized prompt, the context, the
+model name and the last few history turns. Entries are evicted LRU once
+max_entries is reached and expire after ttl seconds; contexts listed in
+disabled_contexts are never cached.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s.?!]+$")
+
+
+def normalize_prompt(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing sentence punctuation."""
+    return _TRAILING_PUNCTUATION_RE.sub("", " ".join(text.casefold().split()))
+
+
+class PromptCache:
+    def __init__(self, max_entries: int = 2048, ttl: float = 600, disabled_contexts=(), history_turns: int = 3):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disabled_contexts = frozenset(disabled_contexts)
+        self.history_turns = history_turns
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "PromptCache":
+        disabled = os.environ.get("PROMPT_CACHE_DISABLED_CONTEXTS", "")
+        return cls(
+            max_entries=int(os.environ.get("PROMPT_CACHE_SIZE", 2048)),
+            ttl=float(os.environ.get("PROMPT_CACHE_TTL", 600)),
+            disabled_contexts=[c.strip() for c in disabled.split(",") if c.strip()],
+            history_turns=int(os.environ.get("PROMPT_CACHE_HISTORY_TURNS", 3)),
+        )
+
+    def key(self, endpoint: str, prompt: str, context: str = "", model: str = "", history=None, options=None,
+            exact: bool = False):
+        """
+        Cache key for a request, or None when caching is off for this context.
+        options holds other request fields that change the answer (depth, language).
+        exact keys on the prompt as given, for prompts where case matters (code).
+        """
+        if self.max_entries <= 0 or context in self.disabled_contexts:
+            return None
+        recent = (history or [])[-self.history_turns:] if self.history_turns else []
+        material = json.dumps(
+            [endpoint, prompt if exact else normalize_prompt(prompt), context, model, recent, options or {}],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,190 @@
+"""
+On-disk HTTP response cache for URLFetcher.
+
+Bodies are stored content-addressed (by SHA-256) so identical pages served
+under different URLs share one file; a SQLite index maps each URL to its
+body plus validators (ETag / Last-Modified) and an expiry. Fresh entries
+are served without a request, stale ones are revalidated with a
+conditional GET, and least-recently-used entries are evicted once the
+total body size exceeds max_bytes.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+from services.sqlite_conn import ProcessConnection
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+# Puts between full recounts of the stored size, which pick up other workers' writes
+RESYNC_EVERY = 256
+
+
+class ResponseCache:
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, default_ttl: float = 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        # Running total of body sizes, so a put does not scan the whole index
+        self._total_bytes = 0
+        self._puts = 0
+        # Connects on first use, in each worker process
+        self._store = ProcessConnection(os.path.join(directory, "index.sqlite"), self._setup)
+
+    @property
+    def _db(self):
+        return self._store.get()
+
+    def _setup(self, db) -> None:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " body_hash TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " encoding TEXT,"
+            " method TEXT NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        db.commit()
+        self._total_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from RESPONSE_CACHE_DIR, or return None when unset."""
+        directory = os.environ.get("RESPONSE_CACHE_DIR")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+            default_ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 3600)),
+        )
+
+    def get(self, url: str):
+        """Return the entry for url (with "content" and "fresh"), or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body_hash, encoding, method, etag, last_modified, expires_at"
+                " FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+        body_hash, encoding, method, etag, last_modified, expires_at = row
+        try:
+            with open(self._body_path(body_hash), "rb") as f:
+                body = f.read()
+        except OSError:
+            # Body evicted or lost underneath us; treat as a miss
+            return None
+        return {
+            "content": body.decode(encoding or "utf-8", errors="replace"),
+            "method": method,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": expires_at > time.time(),
+        }
+
+    def put(self, url: str, body: bytes, headers=None, encoding: str = None, method: str = "http") -> None:
+        headers = headers or {}
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            return
+
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._body_path(body_hash)
+        if not os.path.exists(path):
+            _atomic_write(path, body)
+
+        now = time.time()
+        with self._lock:
+            replaced = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (url, body_hash, size, encoding, method, etag, last_modified, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, len(body), encoding, method, headers.get("ETag"),
+                 headers.get("Last-Modified"), now + self._ttl(cache_control), now),
+            )
+            self._db.commit()
+            self._total_bytes += len(body) - (replaced[0] if replaced else 0)
+            self._puts += 1
+            if self._puts % RESYNC_EVERY == 0:
+                self._total_bytes = self._stored_bytes()
+            self._evict()
+
+    def refresh(self, url: str, headers=None) -> None:
+        """Extend an entry's lifetime after a 304 Not Modified."""
+        headers = headers or {}
+        cache_control = headers.get("Cache-Control", "").lower()
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET expires_at = ?, last_access = ?,"
+                " etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (now + self._ttl(cache_control), now, headers.get("ETag"), headers.get("Last-Modified"), url),
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+    def _ttl(self, cache_control: str) -> float:
+        match = MAX_AGE_RE.search(cache_control)
+        return float(match.group(1)) if match else self.default_ttl
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self) -> None:
+        # Caller holds the lock
+        total = self._total_bytes
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for url, body_hash, size in self._db.execute(
+            "SELECT url, body_hash, size FROM responses ORDER BY last_access"
+        ):
+            victims.append((url, body_hash))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._db.executemany("DELETE FROM responses WHERE url = ?", [(url,) for url, _ in victims])
+        self._db.commit()
+        self._total_bytes = max(0, total)
+        for _, body_hash in victims:
+            # Bodies are shared between URLs; only delete unreferenced ones
+            still_used = self._db.execute("SELECT 1 FROM responses WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+            if still_used is None:
+                try:
+                    os.remove(self._body_path(body_hash))
+                except OSError:
+                    pass
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.directory, "bodies", body_hash[:2], body_hash)
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
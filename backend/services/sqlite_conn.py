@@ -0,0 +1,38 @@
+"""
+SQLite connection opened lazily, once per process.
+
+A SQLite connection must not be used across fork(). gunicorn imports the
+app (and may preload models) in the master before forking workers, so
+stores built there must not connect until they are used, and must
+reconnect if they find themselves in a different process than the one
+that connected.
+"""
+import os
+import sqlite3
+
+
+class ProcessConnection:
+    def __init__(self, path: str, setup=None, timeout: float = 10):
+        # setup(connection) runs after each (re)connect: schema, cleanup, warm state
+        self.path = path
+        self.setup = setup
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+
+    def get(self) -> sqlite3.Connection:
+        """This process's connection. Callers serialize access with their own lock."""
+        if self._connection is None or self._pid != os.getpid():
+            # An inherited connection is abandoned, not closed: closing it here could disturb the parent's locks
+            connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            # WAL lets several gunicorn workers read while one writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._connection, self._pid = connection, os.getpid()
+            if self.setup is not None:
+                self.setup(connection)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
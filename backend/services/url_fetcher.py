@@ -1,49 +1,251 @@
-from playwright.async_api import async_playwright
 import httpx
 import asyncio
+import codecs
 import logging
+import os
+import random
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from services import metrics
+from services.browser_pool import BrowserPool, get_browser_pool
+from services.html_extract import StreamingExtractor
+from services.response_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
+# Transient statuses worth retrying; anything else is returned as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+FETCHES = metrics.counter("url_fetch_total", "URL fetches by how they were answered", ("method",))
+
 class URLFetcher:
-    def __init__(self):
-        self.browser = None
-        self.http_client = httpx.AsyncClient(timeout=10)
-    
+    def __init__(self, browser_pool: BrowserPool = None, concurrency: int = None, per_host: int = None,
+                 max_retries: int = None, cache: ResponseCache = None):
+        self.browser_pool = browser_pool or get_browser_pool()
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.concurrency = concurrency or int(os.environ.get("FETCH_CONCURRENCY", 64))
+        self.per_host = per_host or int(os.environ.get("FETCH_PER_HOST", 4))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("FETCH_RETRIES", 3))
+        self.max_bytes = int(os.environ.get("FETCH_MAX_BYTES", 5 * 1024 * 1024))
+        # HTTP/2 multiplexes requests to the same host over one pooled connection
+        self.http_client = httpx.AsyncClient(
+            timeout=10,
+            http2=True,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+                keepalive_expiry=30,
+            ),
+        )
+
     async def fetch(self, url: str, use_js: bool = True) -> dict:
         """
         Fetch URL content.
         Try JS rendering first (Playwright), fall back to HTTP.
         """
+        entry = await asyncio.to_thread(self.cache.get, url) if self.cache else None
+        if entry is not None and entry["fresh"]:
+            FETCHES.inc(method="cache")
+            return self._from_cache(entry)
+
         try:
-            # Try HTTP first (faster)
-            response = await self.http_client.get(url)
+            # Try HTTP first (faster); revalidate a stale entry instead of re-downloading
+            with metrics.timed("url_fetcher", "http"):
+                response = await self._get_with_retry(url, _conditional_headers(entry))
+            if response.status_code == 304 and entry is not None:
+                FETCHES.inc(method="revalidated")
+                await asyncio.to_thread(self.cache.refresh, url, response.headers)
+                return self._from_cache(entry)
             if response.status_code == 200:
+                FETCHES.inc(method="http")
+                if self.cache:
+                    await asyncio.to_thread(
+                        self.cache.put, url, response.content, response.headers, response.encoding, "http"
+                    )
                 return {
                     "status": 200,
                     "content": response.text,
-                    "method": "http"
+                    "method": "http",
+                    "cached": False
                 }
         except Exception as e:
             logger.warning(f"HTTP fetch failed for {url}: {e}")
-        
+
         if use_js:
             try:
-                # Fall back to Playwright for JS-heavy sites
-                async with async_playwright() as p:
-                    # In production we might want to attach to a persistent browser, but for now launch new
-                    browser = await p.chromium.launch(headless=True)
-                    page = await browser.new_page()
-                    await page.goto(url, wait_until="networkidle")
-                    content = await page.content()
-                    await browser.close()
-                    return {
-                        "status": 200,
-                        "content": content,
-                        "method": "playwright"
-                    }
+                # Fall back to Playwright for JS-heavy sites, on a pooled browser
+                with metrics.timed("url_fetcher", "playwright"):
+                    async with self.browser_pool.page() as page:
+                        await page.goto(url, wait_until="networkidle")
+                        content = await page.content()
+                FETCHES.inc(method="playwright")
+                if self.cache:
+                    # No validators for rendered pages; they simply expire
+                    await asyncio.to_thread(self.cache.put, url, content.encode("utf-8"), {}, "utf-8", "playwright")
+                return {
+                    "status": 200,
+                    "content": content,
+                    "method": "playwright",
+                    "cached": False
+                }
             except Exception as e:
                 logger.error(f"Playwright fetch failed for {url}: {e}")
+                FETCHES.inc(method="error")
                 return {"status": 0, "error": str(e)}
-        
+
+        FETCHES.inc(method="error")
         return {"status": 0, "error": "Failed to fetch"}
+
+    async def fetch_many(self, urls, use_js: bool = False, extract: bool = False):
+        """
+        Fetch many URLs concurrently, yielding each result (with its "url") as it completes.
+        At most `concurrency` requests run at once and at most `per_host` per host.
+        With extract, each result comes from fetch_extract() instead of fetch().
+        """
+        global_limit = asyncio.Semaphore(self.concurrency)
+        host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+        async def fetch_one(url: str) -> dict:
+            # Wait on the host first so a busy host does not hold global slots
+            async with host_limits[urlsplit(url).netloc.lower()]:
+                async with global_limit:
+                    if extract:
+                        result = await self.fetch_extract(url)
+                    else:
+                        result = await self.fetch(url, use_js=use_js)
+            result["url"] = url
+            return result
+
+        tasks = [asyncio.ensure_future(fetch_one(url)) for url in dict.fromkeys(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early; do not leave requests running
+            for task in tasks:
+                task.cancel()
+
+    async def stream(self, url: str, max_bytes: int = None):
+        """
+        Stream url through an incremental HTML parser without holding the body.
+        Yields {"type": "text"|"link"|"email"|"phone", "value"} as they are found,
+        then a final {"type": "end"} with status, bytes read, truncation and the
+        peak number of bytes buffered at once.
+        """
+        max_bytes = max_bytes or self.max_bytes
+        extractor = StreamingExtractor(base_url=url)
+        bytes_read = 0
+        peak_buffered = 0
+        truncated = False
+
+        async with self.http_client.stream("GET", url) as response:
+            if response.status_code != 200:
+                yield {"type": "end", "status": response.status_code, "bytes_read": 0,
+                       "truncated": False, "peak_buffer_bytes": 0}
+                return
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            async for chunk in response.aiter_bytes():
+                if bytes_read + len(chunk) > max_bytes:
+                    chunk = chunk[:max_bytes - bytes_read]
+                    truncated = True
+                bytes_read += len(chunk)
+                for kind, value in extractor.feed(decoder.decode(chunk)):
+                    yield {"type": kind, "value": value}
+                peak_buffered = max(peak_buffered, len(chunk) + extractor.buffered)
+                if truncated:
+                    logger.info(f"Stopped reading {url} at {max_bytes} bytes")
+                    break
+
+        for kind, value in extractor.feed(decoder.decode(b"", final=True)) + extractor.close():
+            yield {"type": kind, "value": value}
+        yield {"type": "end", "status": 200, "bytes_read": bytes_read,
+               "truncated": truncated, "peak_buffer_bytes": peak_buffered}
+
+    async def fetch_extract(self, url: str, max_bytes: int = None, max_text_chars: int = 20000) -> dict:
+        """
+        Streamed, size-capped fetch returning extracted text (first max_text_chars),
+        links, emails and phones instead of the raw page.
+        """
+        text, text_chars, title = [], 0, None
+        found = {"link": [], "email": [], "phone": []}
+        try:
+            with metrics.timed("url_fetcher", "http_stream"):
+                async for event in self.stream(url, max_bytes):
+                    kind = event["type"]
+                    if kind == "text":
+                        if text_chars < max_text_chars:
+                            text.append(event["value"][:max_text_chars - text_chars])
+                            text_chars += len(text[-1])
+                    elif kind == "title":
+                        title = title or event["value"]
+                    elif kind in found:
+                        found[kind].append(event["value"])
+                    else:
+                        end = event
+        except Exception as e:
+            logger.warning(f"Streamed fetch failed for {url}: {e}")
+            FETCHES.inc(method="error")
+            return {"status": 0, "error": str(e)}
+
+        FETCHES.inc(method="http-stream")
+
+        return {
+            "status": end["status"],
+            "method": "http-stream",
+            "title": title,
+            "text": " ".join(text),
+            "links": found["link"],
+            "emails": found["email"],
+            "phones": found["phone"],
+            "bytes_read": end["bytes_read"],
+            "truncated": end["truncated"],
+            "peak_buffer_bytes": end["peak_buffer_bytes"]
+        }
+
+    def _from_cache(self, entry: dict) -> dict:
+        return {
+            "status": 200,
+            "content": entry["content"],
+            "method": entry["method"],
+            "cached": True
+        }
+
+    async def _get_with_retry(self, url: str, headers: dict = None) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.http_client.get(url, headers=headers)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                delay = _retry_after(response) or _backoff(attempt)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _backoff(attempt)
+                logger.info(f"Retrying {url} after {type(e).__name__}")
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self.http_client.aclose()
+
+
+def _conditional_headers(entry) -> dict:
+    if entry is None or entry["method"] != "http":
+        return {}
+    headers = {}
+    if entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _backoff(attempt: int, base: float = 0.5, cap: float = 10.0) -> float:
+    # Full jitter keeps retries from many workers from synchronizing
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_after(response: httpx.Response, cap: float = 30.0):
+    value = response.headers.get("Retry-After", "")
+    return min(float(value), cap) if value.isdigit() else None
@@ -0,0 +1,268 @@
+"""
+Process-wide Vertex AI Gemini client.
+
+The SDK import, aiplatform.init() and GenerativeModel construction happen
+once per process (ideally at worker start via warm()) instead of on every
+chat turn. Health is tracked as a circuit breaker: once Vertex is known
+to be down, every call raises VertexUnavailable immediately and takes the
+fallback path. After retry_after seconds a single call is let through as
+a probe; its success closes the breaker, its failure re-opens it. Set VERTEX_STUB=1 to use a
+local StubModel for tests and benchmarks.
+
+agenerate()/agenerate_stream() use the SDK's native async calls so an
+async server awaits the model without tying up a thread per request.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
+
+
+class VertexUnavailable(Exception):
+    pass
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """
+    Stands in for GenerativeModel: echoes the prompt after a fixed latency.
+    With stream=True the reply arrives word by word, the latency spread evenly.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        text = self._reply(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(self.latency_ms / 1000.0)
+        return StubResponse(text)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        text = self._reply(prompt)
+        if stream:
+            return self._astream(text)
+        await asyncio.sleep(self.latency_ms / 1000.0)
+        return StubResponse(text)
+
+    def _reply(self, prompt: str) -> str:
+        query = prompt.split("User query:", 1)[-1].strip().splitlines()[0] if prompt.strip() else ""
+        return f"[stub] You asked: {query}"
+
+    def _stream(self, text: str):
+        words = text.split(" ")
+        delay = self.latency_ms / 1000.0 / len(words)
+        for i, word in enumerate(words):
+            time.sleep(delay)
+            yield StubResponse(word if i == 0 else " " + word)
+
+    async def _astream(self, text: str):
+        words = text.split(" ")
+        delay = self.latency_ms / 1000.0 / len(words)
+        for i, word in enumerate(words):
+            await asyncio.sleep(delay)
+            yield StubResponse(word if i == 0 else " " + word)
+
+
+class VertexClient:
+    def __init__(self, project: str, location: str = "us-central1", model_name: str = DEFAULT_MODEL,
+                 retry_after: float = 60.0, failure_threshold: int = 3, stub_latency_ms: float = None):
+        self.project = project
+        self.location = location
+        self.model_name = model_name
+        self.retry_after = retry_after
+        self.failure_threshold = failure_threshold
+        self.stub_latency_ms = stub_latency_ms
+        self._model = None
+        self._lock = threading.Lock()
+        self._breaker_lock = threading.Lock()
+        # 0 while the breaker is closed; otherwise when the next probe may go through
+        self._down_until = 0.0
+        self._consecutive_failures = 0
+        self.last_error = None
+
+    @classmethod
+    def from_env(cls, project: str) -> "VertexClient":
+        stub = os.environ.get("VERTEX_STUB", "").lower() in ("1", "true", "yes")
+        return cls(
+            project=project,
+            location=os.environ.get("VERTEX_LOCATION", "us-central1"),
+            model_name=os.environ.get("VERTEX_MODEL", DEFAULT_MODEL),
+            retry_after=float(os.environ.get("VERTEX_RETRY_AFTER", 60)),
+            stub_latency_ms=float(os.environ.get("VERTEX_STUB_LATENCY_MS", 0)) if stub else None,
+        )
+
+    @property
+    def is_stub(self) -> bool:
+        return self.stub_latency_ms is not None
+
+    @property
+    def label(self) -> str:
+        """Model name as reported to API clients."""
+        return "stub" if self.is_stub else self.model_name
+
+    @property
+    def available(self) -> bool:
+        """False while Vertex is marked down; callers should use the fallback."""
+        return time.monotonic() >= self._down_until
+
+    def warm(self) -> bool:
+        """Load the SDK and build the model now rather than on the first request."""
+        try:
+            self.get_model()
+            logger.info(f"Vertex AI model {self.model_name} ready")
+            return True
+        except VertexUnavailable as e:
+            logger.warning(f"Vertex AI warm-up failed, fallback active: {e}")
+            return False
+
+    def get_model(self):
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                try:
+                    self._model = self._load()
+                except Exception as e:
+                    # Init failures (no credentials, bad project) will not fix themselves per request
+                    self._mark_down(e)
+                    raise VertexUnavailable(str(e)) from e
+        return self._model
+
+    def generate(self, prompt: str) -> str:
+        self._admit()
+        model = self.get_model()
+        try:
+            with metrics.timed("vertex", "generate"):
+                response = model.generate_content(prompt)
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self._record_success()
+        return response.text
+
+    def generate_stream(self, prompt: str):
+        """Yield text chunks as the model produces them."""
+        self._admit()
+        model = self.get_model()
+        started = time.perf_counter()
+        try:
+            for chunk in model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    if started is not None:
+                        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, service="vertex", stage="first_token")
+                        started = None
+                    yield chunk.text
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self._record_success()
+
+    async def agenerate(self, prompt: str) -> str:
+        self._admit()
+        model = await self._aget_model()
+        try:
+            with metrics.timed("vertex", "generate"):
+                response = await model.generate_content_async(prompt)
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self._record_success()
+        return response.text
+
+    async def agenerate_stream(self, prompt: str):
+        """Async generate_stream(): yield text chunks without blocking the event loop."""
+        self._admit()
+        model = await self._aget_model()
+        started = time.perf_counter()
+        try:
+            async for chunk in await model.generate_content_async(prompt, stream=True):
+                if chunk.text:
+                    if started is not None:
+                        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, service="vertex", stage="first_token")
+                        started = None
+                    yield chunk.text
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self._record_success()
+
+    def health(self) -> dict:
+        return {
+            "model": self.label,
+            "loaded": self._model is not None,
+            "available": self.available,
+            "retry_in_seconds": max(0.0, self._down_until - time.monotonic()),
+            "consecutive_failures": self._consecutive_failures,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
+
+    async def _aget_model(self):
+        if self._model is not None:
+            return self._model
+        # First load does SDK import and auth; keep it off the event loop
+        return await asyncio.to_thread(self.get_model)
+
+    def _load(self):
+        if self.is_stub:
+            return StubModel(self.stub_latency_ms)
+        from google.cloud import aiplatform
+        from vertexai.generative_models import GenerativeModel
+
+        aiplatform.init(project=self.project, location=self.location)
+        return GenerativeModel(self.model_name)
+
+    def _admit(self) -> None:
+        """Fail fast while the breaker is open; once retry_after has passed, let one probe through."""
+        with self._breaker_lock:
+            if not self._down_until:
+                return
+            now = time.monotonic()
+            if now < self._down_until:
+                raise VertexUnavailable(f"Vertex AI marked down: {self.last_error}")
+            # Half-open: this call is the probe. Others keep failing fast until it
+            # reports back, or until another retry_after passes if it never does.
+            self._down_until = now + self.retry_after
+        logger.info("Vertex AI retry window reached, probing")
+
+    def _record_success(self) -> None:
+        self._consecutive_failures = 0
+        if self._down_until:
+            with self._breaker_lock:
+                self._down_until = 0.0
+            logger.info("Vertex AI probe succeeded, closing breaker")
+
+    def _record_failure(self, error: Exception) -> None:
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.failure_threshold:
+            self._mark_down(error)
+
+    def _mark_down(self, error: Exception) -> None:
+        self.last_error = error
+        with self._breaker_lock:
+            self._down_until = time.monotonic() + self.retry_after
+        logger.warning(f"Vertex AI marked down for {self.retry_after:.0f}s: {error}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_vertex_client(project: str) -> VertexClient:
+    """Process-wide client shared by all requests."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = VertexClient.from_env(project)
+    return _client
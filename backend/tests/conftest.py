@@ -0,0 +1,43 @@
+"""
+Shared test setup. Tests run from backend/ (python -m pytest) and import
+services the way the app does; they need no network, credentials or model
+weights.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main builds its services from the environment at import: use local stand-ins
+os.environ.setdefault("VERTEX_STUB", "1")
+os.environ.setdefault("VERTEX_WARM_ON_START", "false")
+os.environ.setdefault("HARVEST_STATE_DIR", tempfile.mkdtemp(prefix="locale-test-harvest-"))
+os.environ.setdefault("JOB_SPOOL_DIR", tempfile.mkdtemp(prefix="locale-test-jobs-"))
+
+
+@pytest.fixture
+def site():
+    """Local HTTP site (benchmarks.site) with business pages and ?delay_ms= support."""
+    from benchmarks.site import FixtureSite
+
+    with FixtureSite(businesses=20) as fixture:
+        yield fixture
+
+
+@pytest.fixture
+def call_app():
+    """call_app(method, path, **kwargs) -> (status, headers, body text) through main.app's test client."""
+    import main
+
+    def call(method: str, path: str, **kwargs):
+        async def run():
+            response = await main.app.test_client().open(path, method=method, **kwargs)
+            return response.status_code, response.headers, await response.get_data(as_text=True)
+
+        return asyncio.run(run())
+
+    return call
@@ -0,0 +1,36 @@
+import json
+
+
+def events(body):
+    parsed = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def test_tokens_stream_then_done(call_app):
+    status, headers, body = call_app("POST", "/api/ai/chat/stream", json={"message": "plumbers near me", "context": "sse-1"})
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/event-stream")
+    assert headers["Cache-Control"] == "no-cache"
+    stream = events(body)
+    kinds = [kind for kind, _ in stream]
+    assert kinds[-1] == "done" and set(kinds[:-1]) == {"token"} and len(kinds) > 2
+    assert "".join(data["text"] for kind, data in stream[:-1]) == "[stub] You asked: plumbers near me"
+    done = stream[-1][1]
+    assert done["model"] == "stub" and not done["tokens"]["cached"]
+
+
+def test_a_repeated_question_replays_the_cached_answer(call_app):
+    request = {"message": "electricians in austin", "context": "sse-2"}
+    call_app("POST", "/api/ai/chat/stream", json=request)
+    stream = events(call_app("POST", "/api/ai/chat/stream", json=request)[2])
+    assert [kind for kind, _ in stream] == ["token", "done"]
+    assert stream[0][1]["text"] == "[stub] You asked: electricians in austin"
+    assert stream[1][1]["tokens"]["cached"]
+
+
+def test_message_is_required(call_app):
+    status, _, body = call_app("POST", "/api/ai/chat/stream", json={})
+    assert status == 400 and json.loads(body)["error"] == "Message required"
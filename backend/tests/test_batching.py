@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from services.batching import MicroBatcher
+
+
+def test_concurrent_items_share_a_batch_and_keep_their_results():
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(run()) == [i * 2 for i in range(10)]
+    # Full batches flush without waiting for the window
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert batcher.stats()["mean_batch_size"] == 10 / 3
+
+
+def test_a_lone_item_waits_at_most_the_window():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait_ms=20)
+
+    async def run():
+        started = time.monotonic()
+        await batcher.submit("only")
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.5
+    assert batcher.stats()["batches"] == 1
+
+
+def test_a_failed_batch_fails_every_caller_and_the_next_batch_still_runs():
+    calls = []
+
+    def flaky(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise ValueError("model error")
+        return items
+
+    batcher = MicroBatcher(flaky, max_batch_size=2, max_wait_ms=20)
+
+    async def run():
+        failed = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        return failed, await batcher.submit(3)
+
+    failed, result = asyncio.run(run())
+    assert all(isinstance(error, ValueError) for error in failed)
+    assert result == 3
+
+
+def test_a_short_result_list_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    assert all(isinstance(error, RuntimeError) for error in asyncio.run(run()))
+
+
+def test_callers_that_gave_up_are_dropped_from_the_batch():
+    seen = []
+    batcher = MicroBatcher(lambda items: seen.extend(items) or items, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        abandoned = asyncio.create_task(batcher.submit("abandoned"))
+        await asyncio.sleep(0)
+        kept = asyncio.create_task(batcher.submit("kept"))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        return await kept
+
+    assert asyncio.run(run()) == "kept"
+    assert seen == ["kept"]
+
+
+def test_from_env_reads_the_prefixed_settings(monkeypatch):
+    monkeypatch.setenv("FACE_BATCH_SIZE", "16")
+    monkeypatch.setenv("FACE_BATCH_WAIT_MS", "2.5")
+    batcher = MicroBatcher.from_env(lambda items: items, "FACE")
+    assert (batcher.max_batch_size, batcher.max_wait, batcher.name) == (16, 0.0025, "face")
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.browser_pool import BrowserPool, _Browser
+
+
+class FakePage:
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    async def new_page(self):
+        return FakePage()
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowserPool(BrowserPool):
+    """Launches stand-in browsers, so pool bookkeeping is tested without Chromium."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.browsers = []
+
+    async def _launch(self, state):
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        self.launches += 1
+        return _Browser(browser, [FakeContext()])
+
+
+async def borrow(pool, times):
+    for _ in range(times):
+        async with pool.page():
+            pass
+
+
+def test_browser_is_reused_then_recycled():
+    pool = FakeBrowserPool(recycle_after=3)
+    asyncio.run(borrow(pool, 7))
+    assert pool.launches == 3
+    assert [browser.closed for browser in pool.browsers] == [True, True, False]
+
+
+def test_disconnected_browser_is_replaced():
+    pool = FakeBrowserPool()
+
+    async def run():
+        await borrow(pool, 1)
+        pool.browsers[0].connected = False
+        await borrow(pool, 1)
+
+    asyncio.run(run())
+    assert pool.launches == 2
+
+
+def test_each_loop_gets_its_own_browser_and_keeps_it():
+    pool = FakeBrowserPool()
+    in_page, release = threading.Event(), threading.Event()
+
+    def hold_page():
+        async def run():
+            async with pool.page():
+                in_page.set()
+                await asyncio.to_thread(release.wait)
+
+        asyncio.run(run())
+
+    thread = threading.Thread(target=hold_page, daemon=True)
+    thread.start()
+    try:
+        assert in_page.wait(5)
+        # Another loop borrowing a page must not close the first loop's browser mid-page
+        asyncio.run(borrow(pool, 1))
+        assert pool.launches == 2
+        assert not pool.browsers[0].closed
+        assert pool.stats()["active_pages"] == 1
+    finally:
+        release.set()
+        thread.join(5)
+
+
+def test_close_shuts_down_only_the_calling_loops_browser():
+    pool = FakeBrowserPool()
+
+    async def run():
+        await borrow(pool, 1)
+        await pool.close()
+
+    asyncio.run(run())
+    assert pool.browsers[0].closed
+    assert pool.stats()["browsers"] == 0
+
+
+def test_real_chromium_round_trip(site):
+    pytest.importorskip("playwright")
+    pool = BrowserPool(max_pages=2)
+
+    async def run():
+        try:
+            async with pool.page() as page:
+                await page.goto(site.url("/js/1.html"))
+                return await page.title()
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == "Rendered Business 1"
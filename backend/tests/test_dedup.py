@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import threading
+import time
+
+from services.dedup import CLAIMED, DONE, PENDING, EventDeduplicator
+
+
+def race(dedup, namespace, event_id, callers=8):
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def deliver():
+        barrier.wait()
+        results.append(dedup.check_and_mark(namespace, event_id))
+
+    threads = [threading.Thread(target=deliver) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_distinct_events_are_never_reported_as_duplicates():
+    dedup = EventDeduplicator(lru_size=1000)
+    assert not any(dedup.check_and_mark("stripe", f"evt_{i}") for i in range(50000))
+
+
+def test_redelivery_within_the_lru_is_a_duplicate():
+    dedup = EventDeduplicator(lru_size=10)
+    assert not dedup.check_and_mark("stripe", "evt_1")
+    dedup.complete("stripe", "evt_1")
+    assert dedup.check_and_mark("stripe", "evt_1")
+    assert not dedup.is_pending("stripe", "evt_1")
+    assert not dedup.check_and_mark("eventarc", "evt_1")
+
+
+def test_concurrent_redeliveries_run_once():
+    dedup = EventDeduplicator()
+    assert sorted(race(dedup, "stripe", "evt_1")) == [False] + [True] * 7
+    assert dedup.is_pending("stripe", "evt_1")
+
+
+def test_unmarked_events_can_be_retried(tmp_path):
+    dedup = EventDeduplicator(path=str(tmp_path / "events.sqlite"))
+    assert not dedup.check_and_mark("stripe", "evt_1")
+    dedup.unmark("stripe", "evt_1")
+    assert not dedup.check_and_mark("stripe", "evt_1")
+
+
+def test_store_is_shared_and_survives_restarts(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    first, second = EventDeduplicator(path=path), EventDeduplicator(path=path)
+    assert sorted(race(first, "stripe", "evt_1", 4) + race(second, "stripe", "evt_1", 4)) == [False] + [True] * 7
+    first.complete("stripe", "evt_1")
+
+    restarted = EventDeduplicator(path=path, lru_size=10)
+    assert restarted.check_and_mark("stripe", "evt_1")
+    assert not restarted.check_and_mark("stripe", "evt_2")
+
+
+def test_expired_events_are_forgotten(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    dedup = EventDeduplicator(path=path)
+    dedup.check_and_mark("stripe", "evt_old")
+    dedup._db.execute("UPDATE seen_events SET seen_at = 0")
+    dedup._db.commit()
+    assert not EventDeduplicator(path=path, retention_days=7).check_and_mark("stripe", "evt_old")
+
+
+def test_a_claim_left_by_a_crashed_worker_expires(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    # Claimed, then the worker died before complete() or unmark()
+    assert EventDeduplicator(path=path).claim("stripe", "evt_1") == CLAIMED
+
+    redelivery = EventDeduplicator(path=path, claim_ttl=0.05)
+    assert redelivery.claim("stripe", "evt_1") == PENDING
+    assert redelivery.is_pending("stripe", "evt_1")
+    time.sleep(0.06)
+    assert redelivery.claim("stripe", "evt_1") == CLAIMED
+    redelivery.complete("stripe", "evt_1")
+    assert EventDeduplicator(path=path).claim("stripe", "evt_1") == DONE
+
+
+def test_pending_claims_are_visible_to_other_workers(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    first, second = EventDeduplicator(path=path), EventDeduplicator(path=path)
+    assert first.claim("stripe", "evt_1") == CLAIMED
+    assert second.claim("stripe", "evt_1") == PENDING
+    assert second.is_pending("stripe", "evt_1")
+    first.complete("stripe", "evt_1")
+    assert second.claim("stripe", "evt_1") == DONE
+    assert not second.is_pending("stripe", "evt_1")
+
+
+def test_a_late_unmark_does_not_release_a_taken_over_claim(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    slow, takeover = EventDeduplicator(path=path, claim_ttl=0.05), EventDeduplicator(path=path, claim_ttl=0.05)
+    assert slow.claim("stripe", "evt_1") == CLAIMED
+    time.sleep(0.06)
+    assert takeover.claim("stripe", "evt_1") == CLAIMED
+    slow.unmark("stripe", "evt_1")
+    assert EventDeduplicator(path=path).claim("stripe", "evt_1") == PENDING
+
+
+def test_stores_from_before_claim_status_count_as_done(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE seen_events (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+    db.execute("INSERT INTO seen_events VALUES ('stripe:evt_1', ?)", (time.time(),))
+    db.commit()
+    db.close()
+    assert EventDeduplicator(path=path).claim("stripe", "evt_1") == DONE
+
+
+def test_webhook_answers_409_while_another_worker_handles_the_event(tmp_path, monkeypatch, call_app):
+    import main
+
+    path = str(tmp_path / "events.sqlite")
+    other_worker = EventDeduplicator(path=path)
+    monkeypatch.setattr(main, "event_dedup", EventDeduplicator(path=path))
+    assert other_worker.claim("stripe", "evt_busy") == CLAIMED
+
+    status, _, body = call_app("POST", "/webhook/stripe", json={"id": "evt_busy"})
+    assert (status, json.loads(body)["status"]) == (409, "in_progress")
+    other_worker.complete("stripe", "evt_busy")
+    status, _, body = call_app("POST", "/webhook/stripe", json={"id": "evt_busy"})
+    assert (status, json.loads(body)["status"]) == (200, "duplicate")
+
+    assert call_app("POST", "/webhook/stripe", json={"id": "evt_new"})[0] == 200
+    assert other_worker.claim("stripe", "evt_new") == DONE
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.downloader import AsyncDownloader, DownloadError
+
+
+def test_fetch_all_preserves_order(site):
+    downloader = AsyncDownloader()
+    urls = [site.url(f"/biz/{i}.html") for i in (3, 1, 2)]
+
+    async def run():
+        try:
+            return await downloader.fetch_all(urls)
+        finally:
+            await downloader.aclose()
+
+    bodies = asyncio.run(run())
+    assert [b"Business %d Plumbing" % i in body for i, body in zip((3, 1, 2), bodies)] == [True] * 3
+
+
+def test_oversized_bodies_are_refused(site):
+    downloader = AsyncDownloader(max_bytes=1024)
+    with pytest.raises(DownloadError):
+        asyncio.run(downloader.fetch(site.url("/biz/1.html")))
+
+
+def test_concurrency_is_bounded(site):
+    downloader = AsyncDownloader(max_concurrency=2)
+    urls = [site.url(f"/biz/{i}.html?delay_ms=150") for i in range(6)]
+    started = time.monotonic()
+    asyncio.run(downloader.fetch_all(urls))
+    # Three rounds of two
+    assert time.monotonic() - started >= 0.45
+
+
+def test_each_event_loop_keeps_its_own_client(site):
+    downloader = AsyncDownloader()
+    slow = {}
+
+    def fetch_slowly():
+        async def run():
+            slow["started"].set()
+            return await downloader.fetch(site.url("/biz/1.html?delay_ms=300"))
+
+        slow["body"] = asyncio.run(run())
+
+    slow["started"] = threading.Event()
+    thread = threading.Thread(target=fetch_slowly)
+    thread.start()
+    slow["started"].wait()
+    time.sleep(0.1)
+    # A second loop fetching meanwhile must not close the first loop's client
+    assert b"Business 2" in asyncio.run(downloader.fetch(site.url("/biz/2.html")))
+    thread.join()
+    assert b"Business 1" in slow["body"]
@@ -0,0 +1,48 @@
+import numpy as np
+
+from services import metrics
+from services.embedding_cache import EmbeddingCache
+
+
+def lookups(result):
+    return metrics.REGISTRY.counter("embedding_cache_lookups_total", "")._values.get((result,), 0)
+
+
+def test_keys_are_content_addressed_per_model():
+    assert EmbeddingCache.key(b"image", "v1") == EmbeddingCache.key(b"image", "v1")
+    assert EmbeddingCache.key(b"image", "v1") != EmbeddingCache.key(b"image", "v2")
+    assert EmbeddingCache.key(b"image", "v1") != EmbeddingCache.key(b"other", "v1")
+
+
+def test_memory_tier_is_a_bounded_lru():
+    cache = EmbeddingCache(max_entries=2)
+    for name in ("a", "b"):
+        cache.put(name, np.full(4, ord(name)))
+    cache.get("a")
+    cache.put("c", np.zeros(4))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    EmbeddingCache(disk_dir=str(tmp_path)).put("key", np.arange(4))
+    cache = EmbeddingCache(disk_dir=str(tmp_path))
+    np.testing.assert_array_equal(cache.get("key"), np.arange(4, dtype=np.float32))
+    assert cache.stats()["disk_hits"] == 1
+    # Promoted to memory: the next lookup skips the disk
+    cache.get("key")
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_hits_misses_and_size_are_exported():
+    before = {result: lookups(result) for result in ("memory_hit", "miss")}
+    cache = EmbeddingCache(max_entries=8)
+    cache.get("missing")
+    cache.put("key", np.zeros(4))
+    cache.get("key")
+    assert lookups("miss") == before["miss"] + 1
+    assert lookups("memory_hit") == before["memory_hit"] + 1
+    text = metrics.render()
+    assert 'embedding_cache_lookups_total{result="memory_hit"}' in text
+    assert "# TYPE embedding_cache_entries gauge\nembedding_cache_entries 1" in text
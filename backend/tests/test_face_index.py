@@ -0,0 +1,125 @@
+import multiprocessing
+import threading
+
+import numpy as np
+
+from services import face_index
+from services.face_index import ID_BYTES, FaceIndex
+
+
+def unit(seed, dim=8):
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_search_ranks_by_cosine_similarity(tmp_path):
+    index = FaceIndex(str(tmp_path), dim=8)
+    for i in range(10):
+        index.add(f"id-{i}", unit(i))
+    matches = index.search(unit(3), k=3)
+    assert matches[0] == {"identity_id": "id-3", "similarity": matches[0]["similarity"]}
+    assert abs(matches[0]["similarity"] - 1) < 1e-5
+    assert len(matches) == 3
+    assert index.search(unit(3), k=3, threshold=0.99, exclude_identity="id-3") == []
+
+
+def test_search_spans_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(face_index, "CHUNK_ROWS", 4)
+    index = FaceIndex(str(tmp_path), dim=8)
+    for i in range(11):
+        index.add(f"id-{i}", unit(i))
+    assert [match["identity_id"] for match in index.search(unit(9), k=1)] == ["id-9"]
+
+
+def test_concurrent_enrollments_of_one_face_enroll_it_once(tmp_path):
+    index = FaceIndex(str(tmp_path), dim=8)
+    face = unit(0)
+    barrier = threading.Barrier(8)
+    results = {}
+
+    def enroll(identity_id):
+        barrier.wait()
+        results[identity_id] = index.search_and_add(identity_id, face, threshold=0.7)
+
+    threads = [threading.Thread(target=enroll, args=(f"id-{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    enrolled = [identity_id for identity_id, matches in results.items() if not matches]
+    assert len(enrolled) == 1
+    assert len(index) == 1
+    assert all(matches[0]["identity_id"] == enrolled[0] for matches in results.values() if matches)
+
+
+def test_search_and_add_does_not_re_enroll_a_known_face(tmp_path):
+    index = FaceIndex(str(tmp_path), dim=8)
+    assert index.search_and_add("alice", unit(0), threshold=0.7) == []
+    assert index.search_and_add("alice", unit(0), threshold=0.7) == []
+    assert len(index) == 1
+    # A different-looking face of the same identity is still added
+    assert index.search_and_add("alice", unit(1), threshold=0.7) == []
+    assert len(index) == 2
+
+
+def test_workers_forked_from_one_index_see_each_others_faces(tmp_path):
+    index = FaceIndex(str(tmp_path), dim=8)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+
+    def enroll(identity_id):
+        results.put(index.search_and_add(identity_id, unit(0), threshold=0.7))
+
+    for identity_id in ("worker-a", "worker-b"):
+        worker = context.Process(target=enroll, args=(identity_id,))
+        worker.start()
+        worker.join()
+
+    assert results.get() == []
+    assert [match["identity_id"] for match in results.get()] == ["worker-a"]
+    assert len(FaceIndex(str(tmp_path), dim=8)) == 1
+
+
+def test_concurrent_appends_from_several_processes_stay_aligned(tmp_path):
+    index = FaceIndex(str(tmp_path), dim=8)
+    context = multiprocessing.get_context("fork")
+
+    def enroll(worker):
+        for i in range(100):
+            index.add(f"{worker}-{i}", unit(worker * 1000 + i))
+
+    workers = [context.Process(target=enroll, args=(worker,)) for worker in range(1, 4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    reopened = FaceIndex(str(tmp_path), dim=8)
+    assert len(reopened) == 300
+    vectors, ids, count = reopened._map()
+    for row in range(count):
+        worker, i = map(int, ids[row].decode().split("-"))
+        np.testing.assert_allclose(vectors[row], unit(worker * 1000 + i), rtol=1e-6)
+
+
+def test_torn_append_is_trimmed_on_reopen(tmp_path):
+    index = FaceIndex(str(tmp_path), dim=8)
+    index.add("alice", unit(0))
+    with open(index._vectors_path, "ab") as f:
+        f.write(unit(1).tobytes())
+
+    reopened = FaceIndex(str(tmp_path), dim=8)
+    assert len(reopened) == 1
+    assert [match["identity_id"] for match in reopened.search(unit(0))] == ["alice"]
+
+
+def test_rejects_bad_input(tmp_path):
+    index = FaceIndex(str(tmp_path), dim=8)
+    for identity_id, embedding in (("", unit(0)), ("x" * (ID_BYTES + 1), unit(0)), ("alice", np.ones(4))):
+        try:
+            index.add(identity_id, embedding)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {identity_id!r}")
+    assert len(index) == 0
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from services.harvester import HarvestBusy, HarvestEngine
+
+
+def seeds(site, pages, delay_ms=0):
+    return [site.url(f"/biz/{i}.html?delay_ms={delay_ms}") for i in range(pages)]
+
+
+def test_claim_is_exclusive_until_released(tmp_path):
+    first, second = HarvestEngine(str(tmp_path)), HarvestEngine(str(tmp_path))
+    job_id = HarvestEngine.job_id("Austin", "TX", "Plumbing")
+    lease = first.claim(job_id)
+    assert lease
+    # Not even the same engine gets a second run of a claimed job
+    assert first.claim(job_id) is None
+    assert second.claim(job_id) is None
+    first.release(job_id, lease)
+    taken = second.claim(job_id)
+    assert taken
+    # Releasing a lease that is no longer ours does nothing
+    first.release(job_id, lease)
+    assert first.claim(job_id) is None
+    second.release(job_id, taken)
+
+
+def test_expired_lease_can_be_taken_over(tmp_path):
+    first = HarvestEngine(str(tmp_path), lease_seconds=0.05)
+    second = HarvestEngine(str(tmp_path))
+    lease = first.claim("job")
+    time.sleep(0.06)
+    assert second.claim("job")
+    assert not first._renew_lease("job", lease)
+
+
+def test_run_unknown_job_raises_and_leaves_no_lease(tmp_path):
+    engine = HarvestEngine(str(tmp_path))
+    with pytest.raises(ValueError):
+        asyncio.run(engine.run("missing"))
+    assert engine._lease_holder("missing") is None
+
+
+def test_run_is_refused_while_another_run_holds_the_job(tmp_path, site):
+    engine = HarvestEngine(str(tmp_path))
+    job = engine.prepare("Austin", "TX", "Plumbing", seeds(site, 2))
+    # prepare() holds the job for the run it queued
+    with pytest.raises(HarvestBusy):
+        asyncio.run(engine.run(job["job_id"]))
+    with pytest.raises(HarvestBusy):
+        asyncio.run(HarvestEngine(str(tmp_path)).run(job["job_id"]))
+    assert engine.status(job["job_id"])["status"] == "queued"
+    assert asyncio.run(engine.run(job["job_id"], job["lease"]))["status"] == "completed"
+
+
+def test_a_queued_job_is_not_prepared_twice(tmp_path, site):
+    engine = HarvestEngine(str(tmp_path))
+    job = engine.prepare("Austin", "TX", "Plumbing", seeds(site, 2))
+    # Even once the queued run's lease has lapsed, a second trigger must not queue another run
+    engine._release_lease(job["job_id"], job["lease"])
+    with pytest.raises(HarvestBusy):
+        engine.prepare("Austin", "TX", "Plumbing", seeds(site, 2))
+
+
+def test_concurrent_runs_in_one_worker_do_not_both_crawl(tmp_path, site):
+    engine = HarvestEngine(str(tmp_path), max_depth=0)
+    job = engine.prepare("Austin", "TX", "Plumbing", seeds(site, 3, delay_ms=100))
+    engine.release(job["job_id"], job["lease"])
+
+    async def scenario():
+        return await asyncio.gather(
+            engine.run(job["job_id"]), engine.run(job["job_id"]), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert sum(isinstance(result, HarvestBusy) for result in results) == 1
+    summary = next(result for result in results if isinstance(result, dict))
+    assert summary["status"] == "completed"
+    assert summary["pages_fetched"] == 3
+
+
+def test_released_queued_job_is_paused_and_resumed(tmp_path, site):
+    engine = HarvestEngine(str(tmp_path))
+    job = engine.prepare("Austin", "TX", "Plumbing", seeds(site, 2))
+    # The queue was full: give the claim back
+    engine.release(job["job_id"], job["lease"])
+    assert engine.status(job["job_id"])["status"] == "paused"
+    assert engine.incomplete_jobs() == [job["job_id"]]
+    assert engine.prepare("Austin", "TX", "Plumbing", seeds(site, 2))["status"] == "queued"
+
+
+def test_lease_is_renewed_during_slow_batches(tmp_path, site):
+    runner = HarvestEngine(str(tmp_path), batch_size=2, lease_seconds=0.6)
+    rival = HarvestEngine(str(tmp_path))
+    job = runner.prepare("Austin", "TX", "Plumbing", seeds(site, 6, delay_ms=400))
+
+    async def scenario():
+        run = asyncio.create_task(runner.run(job["job_id"], job["lease"]))
+        # Well past lease_seconds: only renewal keeps the rival out
+        await asyncio.sleep(1.5)
+        claimed = await asyncio.to_thread(rival.claim, job["job_id"])
+        return claimed, await run
+
+    claimed, summary = asyncio.run(scenario())
+    assert not claimed
+    assert summary["status"] == "completed"
+    assert runner._lease_holder(job["job_id"]) is None
+
+
+def test_interrupted_run_resumes_where_it_stopped(tmp_path, site):
+    # No link following, so the job is exactly the four seed pages
+    engine = HarvestEngine(str(tmp_path), max_depth=0)
+    job = engine.prepare("Austin", "TX", "Plumbing", seeds(site, 4))
+    # Simulate a worker that died mid-run: checkpoint says running, lease expired
+    path = engine._path(job["job_id"])
+    with open(path) as f:
+        checkpoint = json.load(f)
+    checkpoint["status"] = "running"
+    with open(path, "w") as f:
+        json.dump(checkpoint, f)
+    os.remove(engine._path(job["job_id"], ".lease"))
+
+    restarted = HarvestEngine(str(tmp_path), max_depth=0)
+    assert restarted.incomplete_jobs() == [job["job_id"]]
+    lease = restarted.claim(job["job_id"])
+    assert lease
+    assert HarvestEngine(str(tmp_path)).claim(job["job_id"]) is None
+
+    summary = asyncio.run(restarted.run(job["job_id"], lease))
+    assert summary["status"] == "completed"
+    assert summary["leads"] == 4
+    assert restarted.status(job["job_id"])["pending"] == 0
+    assert restarted.incomplete_jobs() == []
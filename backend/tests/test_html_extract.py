@@ -0,0 +1,32 @@
+from benchmarks.site import business_page
+from services.html_extract import StreamingExtractor
+
+
+def extract(html, chunk_size):
+    extractor = StreamingExtractor(base_url="http://example.test/biz/1.html")
+    events = []
+    for start in range(0, len(html), chunk_size):
+        events += extractor.feed(html[start:start + chunk_size])
+    return events + extractor.close()
+
+
+def test_chunk_boundaries_do_not_change_the_result():
+    html = business_page(7, businesses=20)
+    whole = extract(html, len(html))
+    assert extract(html, 7) == whole
+    assert extract(html, 1) == whole
+
+
+def test_extracts_title_contacts_and_absolute_links():
+    events = extract(business_page(7, businesses=20), 64)
+    assert ("title", "Business 7 Plumbing LLC") in events
+    assert ("phone", "5125550007") in events
+    assert ("email", "office7@business7.example") in events
+    assert ("link", "http://example.test/biz/8.html") in events
+    # Script and style bodies are not text
+    assert not any("analytics" in value for kind, value in events if kind == "text")
+
+
+def test_repeated_contacts_are_reported_once():
+    events = extract('<a href="tel:+1 (512) 555-0100">Call</a> (512) 555-0100 <a href="tel:5125550100">x</a>', 5)
+    assert [value for kind, value in events if kind == "phone"] == ["5125550100"]
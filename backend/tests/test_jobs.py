@@ -0,0 +1,202 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from services.jobs import JobQueue, QueueFull
+
+
+def wait_for(job_queue, job_ids, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        states = [job_queue.status(job_id)["state"] for job_id in job_ids]
+        if all(state in ("succeeded", "failed") for state in states):
+            return states
+        time.sleep(0.01)
+    raise AssertionError(f"jobs did not finish: {states}")
+
+
+@pytest.fixture
+def jobs():
+    job_queue = JobQueue(io_workers=2, cpu_workers=2, max_pending=10, backoff_base=0.01)
+    yield job_queue
+    job_queue.shutdown()
+
+
+class CheckingQueue(queue.Queue):
+    """Asserts a job is already stored when its id is queued, the window the dispatcher races."""
+
+    def __init__(self, job_queue, maxsize):
+        super().__init__(maxsize)
+        self.job_queue = job_queue
+
+    def put_nowait(self, job_id):
+        assert self.job_queue.status(job_id) is not None
+        super().put_nowait(job_id)
+
+
+def test_job_is_stored_before_it_is_queued(jobs):
+    jobs.register("echo", lambda value: {"value": value})
+    jobs._pending["io"] = CheckingQueue(jobs, 10)
+    job_ids = [jobs.submit("echo", {"value": i}) for i in range(5)]
+    assert wait_for(jobs, job_ids) == ["succeeded"] * 5
+    assert [jobs.status(job_id)["result"]["value"] for job_id in job_ids] == list(range(5))
+
+
+def test_queue_full_leaves_no_phantom_job(jobs):
+    release = threading.Event()
+    jobs.register("block", lambda: release.wait(5))
+    jobs._pending["io"] = queue.Queue(maxsize=1)
+    jobs._slots["io"] = threading.BoundedSemaphore(1)
+    accepted = []
+    with pytest.raises(QueueFull):
+        for _ in range(10):
+            accepted.append(jobs.submit("block", {}))
+    assert sum(jobs.stats()["states"].values()) == len(accepted)
+    release.set()
+    wait_for(jobs, accepted)
+
+
+def test_history_never_evicts_unfinished_jobs():
+    jobs = JobQueue(io_workers=1, max_pending=50, history=3)
+    release = threading.Event()
+    jobs.register("block", lambda: release.wait(5))
+    try:
+        job_ids = [jobs.submit("block", {}) for _ in range(8)]
+        assert all(jobs.status(job_id) is not None for job_id in job_ids)
+        release.set()
+        wait_for(jobs, job_ids)
+        jobs.register("noop", lambda: {})
+        last = jobs.submit("noop", {})
+        wait_for(jobs, [last])
+        # Finished jobs are evicted oldest first once a new one arrives
+        assert jobs.status(job_ids[0]) is None
+        assert jobs.status(last) is not None
+    finally:
+        jobs.shutdown()
+
+
+def test_failed_jobs_retry_then_fail(jobs):
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("transient")
+        return {"ok": True}
+
+    def broken():
+        raise RuntimeError("permanent")
+
+    jobs.register("flaky", flaky)
+    jobs.register("broken", broken)
+    flaky_id, broken_id = jobs.submit("flaky", {}), jobs.submit("broken", {})
+    wait_for(jobs, [flaky_id, broken_id])
+    assert jobs.status(flaky_id)["state"] == "succeeded"
+    assert jobs.status(flaky_id)["attempts"] == 3
+    assert jobs.status(broken_id)["state"] == "failed"
+    assert jobs.status(broken_id)["error"] == "permanent"
+
+
+def test_cpu_jobs_run_on_threads_in_this_process(jobs):
+    jobs.register("where", lambda: {"thread": threading.current_thread().name}, kind="cpu")
+    job_id = jobs.submit("where", {})
+    wait_for(jobs, [job_id])
+    assert jobs.status(job_id)["result"]["thread"].startswith("jobs-cpu")
+
+
+def test_unknown_job_type_is_rejected(jobs):
+    with pytest.raises(ValueError):
+        jobs.submit("missing", {})
+
+
+def test_unfinished_jobs_are_spooled_at_shutdown_and_recovered(tmp_path):
+    release = threading.Event()
+    stopping = JobQueue(io_workers=1, max_pending=10, spool_dir=str(tmp_path))
+    stopping.register("work", lambda value: release.wait(5) and {"value": value})
+    job_ids = [stopping.submit("work", {"value": i}) for i in range(3)]
+    while stopping.status(job_ids[0])["state"] != "running":
+        time.sleep(0.01)
+    shutdown = threading.Thread(target=stopping.shutdown)
+    shutdown.start()
+    release.set()
+    shutdown.join(5)
+    # The running job finished; the two still queued were acknowledged but never ran
+    assert stopping.status(job_ids[0])["state"] == "succeeded"
+    assert stopping.persist_unfinished() == 2
+
+    restarted = JobQueue(io_workers=1, max_pending=10, spool_dir=str(tmp_path))
+    restarted.register("work", lambda value: {"value": value})
+    try:
+        recovered = restarted.recover()
+        assert wait_for(restarted, recovered) == ["succeeded"] * 2
+        assert sorted(restarted.status(job_id)["result"]["value"] for job_id in recovered) == [1, 2]
+        assert os.listdir(tmp_path) == []
+        # Already taken: another worker recovering the same directory finds nothing
+        assert restarted.recover() == []
+    finally:
+        restarted.shutdown()
+
+
+def test_recover_leaves_jobs_that_do_not_fit_spooled(tmp_path):
+    stopping = JobQueue(io_workers=1, max_pending=10, spool_dir=str(tmp_path))
+    stopping.register("work", lambda: {})
+    stopping._ensure_started = lambda: None  # nothing dispatches, so all three stay queued
+    for _ in range(3):
+        stopping.submit("work", {})
+    assert stopping.persist_unfinished() == 3
+
+    small = JobQueue(io_workers=1, max_pending=1, spool_dir=str(tmp_path))
+    release = threading.Event()
+    small.register("work", lambda: release.wait(5))
+    small._ensure_started = lambda: None
+    try:
+        assert len(small.recover()) == 1
+        assert len([name for name in os.listdir(tmp_path) if name.endswith(".json")]) == 2
+    finally:
+        release.set()
+        small.shutdown()
+
+
+def test_run_on_serving_loop_uses_the_workers_loop():
+    import main
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def which_loop():
+        return asyncio.get_running_loop()
+
+    previous = main._serving_loop
+    main._serving_loop = loop
+    try:
+        assert main.run_on_serving_loop(which_loop()) is loop
+    finally:
+        main._serving_loop = previous
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+    # Without a running serving loop it runs on a fresh one
+    assert main.run_on_serving_loop(which_loop()) is not loop
+
+
+def test_run_on_serving_loop_gives_up_when_the_loop_stops():
+    import main
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    previous = main._serving_loop
+    main._serving_loop = loop
+    try:
+        loop.call_later(0.2, loop.stop)
+        with pytest.raises(RuntimeError):
+            main.run_on_serving_loop(asyncio.sleep(30))
+    finally:
+        main._serving_loop = previous
+        thread.join(5)
+        loop.close()
@@ -0,0 +1,35 @@
+from PIL import Image, ImageDraw
+
+from services.line_segmenter import crop_lines, segment_lines
+
+
+def page(blocks, rules=()):
+    image = Image.new("RGB", (600, 400), "white")
+    draw = ImageDraw.Draw(image)
+    for box in blocks:
+        draw.rectangle(box, fill="black")
+    for y in rules:
+        draw.rectangle((0, y, 599, y + 1), fill="black")
+    return image
+
+
+def test_lines_come_back_in_reading_order():
+    image = page([(50, 100, 300, 111), (400, 50, 549, 61), (50, 50, 249, 61)])
+    assert segment_lines(image) == [(46, 46, 254, 66), (396, 46, 554, 66), (46, 96, 305, 116)]
+
+
+def test_form_rules_do_not_merge_lines():
+    # Only the rule separates the two lines
+    image = page([(50, 50, 249, 61), (50, 64, 249, 75)], rules=[62])
+    assert len(segment_lines(image)) == 2
+
+
+def test_specks_and_blank_pages_yield_no_lines():
+    assert segment_lines(page([])) == []
+    assert segment_lines(page([(10, 10, 11, 11)])) == []
+
+
+def test_crops_match_the_boxes():
+    image = page([(50, 50, 249, 61)])
+    boxes = segment_lines(image)
+    assert [crop.size for crop in crop_lines(image, boxes)] == [(right - left, bottom - top) for left, top, right, bottom in boxes]
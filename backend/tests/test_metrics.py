@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from services import metrics
+
+
+def test_process_memory_is_exported():
+    rendered = metrics.render()
+    line = next(line for line in rendered.splitlines() if line.startswith("process_resident_memory_bytes "))
+    assert int(line.split()[1]) > 1024 * 1024
+    assert metrics.memory_usage()["rss_mb"] > 1
+
+
+def test_timed_stages_feed_the_stage_histogram():
+    with metrics.timed("test", "sleep"):
+        time.sleep(0.01)
+    rendered = metrics.render()
+    assert 'stage_duration_seconds_count{service="test",stage="sleep"} 1' in rendered
+    # Cumulative buckets: 10 ms lands past the 5 ms bucket
+    assert 'stage_duration_seconds_bucket{service="test",stage="sleep",le="0.005"} 0' in rendered
+    assert 'stage_duration_seconds_bucket{service="test",stage="sleep",le="+Inf"} 1' in rendered
+
+
+def test_metrics_route_reports_requests_by_route_pattern(call_app):
+    call_app("GET", "/api/jobs/not-a-job")
+    status, headers, body = call_app("GET", "/metrics")
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/api/jobs/<job_id>",status="404"}' in body
+    assert "not-a-job" not in body
+
+
+def test_profiler_is_off_unless_enabled(monkeypatch, call_app):
+    monkeypatch.delenv("PROFILER_ENABLED", raising=False)
+    assert call_app("GET", "/debug/profile?seconds=0.1")[0] == 404
+
+
+@pytest.mark.parametrize("query", ["seconds=abc", "seconds=0", "seconds=-1", "interval_ms=0", "interval_ms=5000"])
+def test_profiler_rejects_bad_arguments(monkeypatch, call_app, query):
+    monkeypatch.setenv("PROFILER_ENABLED", "true")
+    assert call_app("GET", f"/debug/profile?{query}")[0] == 400
+
+
+def test_profiler_returns_collapsed_stacks(monkeypatch, call_app):
+    monkeypatch.setenv("PROFILER_ENABLED", "true")
+    status, _, body = call_app("GET", "/debug/profile?seconds=0.2&interval_ms=5")
+    assert status == 200
+    # "frame;frame;... count" per line
+    first = body.splitlines()[0]
+    assert ";" in first and first.rsplit(" ", 1)[1].isdigit()
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from services.ocr_cache import OcrCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return OcrCache(str(tmp_path / "ocr.sqlite"))
+
+
+def test_concurrent_parses_share_one_computation(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"ein": "12-3456789"}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("page", compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [extracted for extracted, _ in results] == [{"ein": "12-3456789"}] * 5
+    assert sorted(cached for _, cached in results) == [False, True, True, True, True]
+    # Stored: later parses are cache hits
+    assert asyncio.run(cache.get_or_compute("page", compute)) == ({"ein": "12-3456789"}, True)
+    assert len(calls) == 1
+
+
+def test_cancelling_the_first_caller_does_not_fail_followers(cache):
+    async def run():
+        started = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await asyncio.sleep(0.05)
+            return {"ein": "98-7654321"}
+
+        leader = asyncio.create_task(cache.get_or_compute("page", compute))
+        await started.wait()
+        follower = asyncio.create_task(cache.get_or_compute("page", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == ({"ein": "98-7654321"}, True)
+    assert cache.get("page") == {"ein": "98-7654321"}
+
+
+def test_failures_reach_every_caller_and_are_not_cached(cache):
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("unreadable page")
+
+    async def run():
+        return await asyncio.gather(
+            *(cache.get_or_compute("page", compute) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert cache.get("page") is None
+    assert cache._inflight == {}
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+from PIL import Image
+
+import main
+from services.pdf_pages import iter_pages
+
+
+def write_pdf(path, pages=3):
+    images = [Image.new("RGB", (200, 100), (255, 255 - 40 * i, 255)) for i in range(pages)]
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=72)
+
+
+def test_pages_without_a_text_layer_are_rendered_one_at_a_time(tmp_path):
+    path = str(tmp_path / "scan.pdf")
+    write_pdf(path)
+    pages = iter_pages(path, dpi=144)
+    first = next(pages)
+    assert first["page"] == 1 and first["text"] is None
+    # Rendered at 2x the PDF's 72 dpi
+    assert first["image"].size == (400, 200)
+    assert [page["page"] for page in pages] == [2, 3]
+
+
+class FakeStorage:
+    # Stands in for the GCS client: "downloads" a local PDF
+    def __init__(self, source):
+        self.source = source
+
+    def bucket(self, name):
+        return self
+
+    def blob(self, name):
+        return self
+
+    def download_to_filename(self, path):
+        with open(self.source, "rb") as src, open(path, "wb") as dst:
+            dst.write(src.read())
+
+
+class FakeParser:
+    async def parse_pdf(self, path):
+        for page in iter_pages(path):
+            yield {"page": page["page"], "status": "success"}
+
+
+def test_loading_the_parser_does_not_block_the_serving_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "k1.pdf")
+    write_pdf(path, pages=2)
+    monkeypatch.setattr(main, "get_storage_client", lambda: FakeStorage(path))
+    loads = threading.Event()
+
+    def load_parser():
+        loads.set()
+        time.sleep(0.3)
+        return FakeParser()
+
+    monkeypatch.setattr(main, "get_k1_parser", load_parser)
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        pages = await main.parse_pdf_from_storage("bucket", "k1.pdf")
+        ticker.cancel()
+        return pages, ticks
+
+    pages, ticks = asyncio.run(run())
+    assert loads.is_set()
+    assert [page["page"] for page in pages] == [1, 2]
+    # The loop kept serving while the parser loaded
+    assert ticks >= 10
@@ -0,0 +1,33 @@
+import time
+
+from services.prompt_cache import PromptCache, normalize_prompt
+
+
+def test_normalization_keeps_meaningful_punctuation():
+    assert normalize_prompt("  What is  a LEAD?  ") == normalize_prompt("what is a lead")
+    assert len({normalize_prompt(p) for p in ("Explain C++", "Explain C", "Explain C#")}) == 3
+    assert normalize_prompt("what is 2+2") != normalize_prompt("what is 2-2")
+
+
+def test_exact_keys_respect_case():
+    cache = PromptCache()
+    assert cache.key("/api/ai/code", "def Foo(): pass", exact=True) != cache.key("/api/ai/code", "def foo(): pass", exact=True)
+    assert cache.key("/api/ai/chat", "Hello", "general") == cache.key("/api/ai/chat", "hello.", "general")
+
+
+def test_disabled_contexts_are_not_cached():
+    cache = PromptCache(disabled_contexts=["billing"])
+    assert cache.key("/api/ai/chat", "hello", "billing") is None
+    cache.put(None, "answer")
+    assert cache.get(None) is None
+
+
+def test_entries_expire_and_evict():
+    cache = PromptCache(max_entries=2, ttl=0.05)
+    keys = [cache.key("/api/ai/chat", f"question {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, f"answer {i}")
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == "answer 2"
+    time.sleep(0.06)
+    assert cache.get(keys[2]) is None
@@ -0,0 +1,71 @@
+import json
+import time
+
+import pytest
+
+
+@pytest.fixture
+def models(monkeypatch):
+    """main with fake model loaders and a clean readiness state."""
+    import main
+
+    monkeypatch.setenv("PRELOAD_MODELS", "face,ocr")
+    monkeypatch.setattr(main, "_model_status", {})
+    monkeypatch.setattr(main, "_model_failed_at", None)
+    return main
+
+
+def wait_until_ready(main, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not main.models_ready():
+        time.sleep(0.01)
+
+
+def test_ready_is_503_until_models_load(models, monkeypatch, call_app):
+    monkeypatch.setattr(models, "MODEL_LOADERS", {"face": lambda: None, "ocr": lambda: None})
+    status, _, body = call_app("GET", "/ready")
+    assert status == 503
+    assert json.loads(body)["models"] == {"face": "pending", "ocr": "pending"}
+
+    models.preload_models()
+    status, _, body = call_app("GET", "/ready")
+    assert status == 200
+    assert json.loads(body)["models"] == {"face": "ready", "ocr": "ready"}
+
+
+def test_failed_load_is_retried_from_ready(models, monkeypatch, call_app):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("weights download interrupted")
+
+    monkeypatch.setattr(models, "MODEL_LOADERS", {"face": flaky, "ocr": lambda: None})
+    monkeypatch.setenv("MODEL_RETRY_SECONDS", "0")
+    models.preload_models()
+    assert models._model_status["face"].startswith("failed")
+
+    status, _, _ = call_app("GET", "/ready")
+    assert status == 503
+    wait_until_ready(models)
+    assert call_app("GET", "/ready")[0] == 200
+    assert len(attempts) == 2
+
+
+def test_failed_load_waits_before_retrying(models, monkeypatch, call_app):
+    def broken():
+        raise OSError("no weights")
+
+    monkeypatch.setattr(models, "MODEL_LOADERS", {"face": broken, "ocr": lambda: None})
+    monkeypatch.setenv("MODEL_RETRY_SECONDS", "60")
+    models.preload_models()
+    failed_at = models._model_failed_at
+    assert call_app("GET", "/ready")[0] == 503
+    assert models._model_failed_at == failed_at
+
+
+def test_unknown_preload_model_is_rejected(models, monkeypatch):
+    monkeypatch.setenv("PRELOAD_MODELS", "face,gpu")
+    with pytest.raises(ValueError, match="gpu"):
+        models.preload_model_names()
@@ -0,0 +1,69 @@
+import asyncio
+
+from services import response_cache
+from services.response_cache import ResponseCache
+from services.url_fetcher import URLFetcher
+
+
+def test_entries_round_trip_with_validators(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put("http://a/", b"hello", {"ETag": '"v1"', "Cache-Control": "max-age=60"}, "utf-8")
+    entry = cache.get("http://a/")
+    assert (entry["content"], entry["etag"], entry["fresh"]) == ("hello", '"v1"', True)
+    assert cache.get("http://missing/") is None
+
+
+def test_no_store_and_expiry(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put("http://a/", b"secret", {"Cache-Control": "no-store"})
+    assert cache.get("http://a/") is None
+    cache.put("http://b/", b"stale", {"Cache-Control": "max-age=0"})
+    assert cache.get("http://b/")["fresh"] is False
+    cache.refresh("http://b/", {"Cache-Control": "max-age=60"})
+    assert cache.get("http://b/")["fresh"] is True
+
+
+def test_identical_bodies_share_storage_and_survive_partial_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10)
+    cache.put("http://a/", b"same body")
+    cache.put("http://b/", b"same body")
+    assert cache.stats()["entries"] == 1
+    assert cache.get("http://b/")["content"] == "same body"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=25)
+    for name in "abc":
+        cache.put(f"http://{name}/", name.encode() * 10)
+    assert cache.get("http://a/") is None
+    assert cache.stats()["bytes"] == 20
+
+
+def test_running_total_matches_the_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "RESYNC_EVERY", 10**9)
+    cache = ResponseCache(str(tmp_path), max_bytes=4000)
+    for i in range(300):
+        # Overwrites, shared bodies and evictions all move the total
+        cache.put(f"http://{i % 40}/", b"x" * (i % 97 + 1))
+    assert cache._total_bytes == cache._stored_bytes() == cache.stats()["bytes"]
+    assert cache._total_bytes <= 4000
+    # A fresh process starts from the stored total
+    restarted = ResponseCache(str(tmp_path), max_bytes=4000)
+    restarted.get("http://0/")
+    assert restarted._total_bytes == cache._total_bytes
+
+
+def test_fetcher_revalidates_stale_entries_with_a_conditional_get(tmp_path, site):
+    cache = ResponseCache(str(tmp_path), default_ttl=0)
+    fetcher = URLFetcher(cache=cache)
+    url = site.url("/biz/1.html")
+
+    async def run():
+        try:
+            return [await fetcher.fetch(url, use_js=False) for _ in range(2)]
+        finally:
+            await fetcher.aclose()
+
+    first, second = asyncio.run(run())
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["content"] == first["content"]
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from services.url_fetcher import URLFetcher
+
+
+def collect(fetcher, urls, **kwargs):
+    async def run():
+        try:
+            return [result async for result in fetcher.fetch_many(urls, **kwargs)]
+        finally:
+            await fetcher.aclose()
+
+    return asyncio.run(run())
+
+
+def test_fetch_many_yields_results_as_they_complete(site):
+    slow, fast = site.url("/biz/1.html?delay_ms=300"), site.url("/biz/2.html")
+    results = collect(URLFetcher(cache=None), [slow, fast, fast])
+    # Duplicates are fetched once
+    assert [result["url"] for result in results] == [fast, slow]
+    assert all(result["status"] == 200 and result["method"] == "http" for result in results)
+
+
+def test_fetch_many_limits_requests_per_host(site):
+    urls = [site.url(f"/biz/{i}.html?delay_ms=150") for i in range(6)]
+    started = time.monotonic()
+    results = collect(URLFetcher(cache=None, concurrency=64, per_host=2), urls)
+    assert len(results) == 6
+    # Three rounds of two against the one host
+    assert time.monotonic() - started >= 0.45
+
+
+def test_fetch_many_runs_a_host_in_parallel_up_to_its_limit(site):
+    urls = [site.url(f"/biz/{i}.html?delay_ms=300") for i in range(4)]
+    started = time.monotonic()
+    collect(URLFetcher(cache=None, per_host=4), urls)
+    assert time.monotonic() - started < 1.0
+
+
+def test_stopping_early_cancels_the_rest(site):
+    fetcher = URLFetcher(cache=None)
+    urls = [site.url("/biz/1.html")] + [site.url(f"/biz/{i}.html?delay_ms=2000") for i in range(2, 6)]
+
+    async def run():
+        started = time.monotonic()
+        try:
+            async for result in fetcher.fetch_many(urls):
+                break
+        finally:
+            await fetcher.aclose()
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result["url"] == urls[0]
+    assert elapsed < 1.5
+
+
+def test_missing_pages_are_reported_not_raised(site):
+    results = collect(URLFetcher(cache=None, max_retries=0), [site.url("/nope.html")])
+    assert results[0]["status"] == 0
+
+
+def test_fetch_extract_stops_reading_at_max_bytes(site):
+    fetcher = URLFetcher(cache=None)
+
+    async def run():
+        try:
+            return await fetcher.fetch_extract(site.url("/biz/3.html"), max_bytes=600)
+        finally:
+            await fetcher.aclose()
+
+    result = asyncio.run(run())
+    assert result["status"] == 200
+    assert result["truncated"] and result["bytes_read"] == 600
+    assert result["title"] == "Business 3 Plumbing LLC"
+    # The contact line sits past the cap
+    assert result["phones"] == []
+
+
+def test_fetch_extract_reads_whole_pages_under_the_cap(site):
+    fetcher = URLFetcher(cache=None)
+
+    async def run():
+        try:
+            return await fetcher.fetch_extract(site.url("/biz/3.html"))
+        finally:
+            await fetcher.aclose()
+
+    result = asyncio.run(run())
+    assert not result["truncated"]
+    assert result["phones"] == ["5125550003"]
+    assert result["emails"] == ["office3@business3.example"]
+    assert result["peak_buffer_bytes"] <= result["bytes_read"]
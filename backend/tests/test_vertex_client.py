@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from services.vertex_client import StubResponse, VertexClient, VertexUnavailable
+
+
+class FlakyModel:
+    def __init__(self):
+        self.calls = 0
+        self.failing = True
+
+    def _answer(self):
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError("vertex down")
+        return StubResponse("ok")
+
+    def generate_content(self, prompt, stream=False):
+        return self._answer()
+
+    async def generate_content_async(self, prompt, stream=False):
+        return self._answer()
+
+
+@pytest.fixture
+def client():
+    vertex = VertexClient("test-project", retry_after=0.2, failure_threshold=3, stub_latency_ms=0)
+    vertex._model = FlakyModel()
+    return vertex
+
+
+def call(vertex):
+    try:
+        return vertex.generate("hello")
+    except VertexUnavailable:
+        return "unavailable"
+    except RuntimeError:
+        return "error"
+
+
+def test_open_breaker_stops_calling_the_model(client):
+    results = [call(client) for _ in range(10)]
+    assert results == ["error"] * 3 + ["unavailable"] * 7
+    assert client._model.calls == 3
+    assert not client.available
+
+
+def test_open_breaker_blocks_async_calls(client):
+    for _ in range(3):
+        call(client)
+
+    async def attempt():
+        with pytest.raises(VertexUnavailable):
+            await client.agenerate("hello")
+        with pytest.raises(VertexUnavailable):
+            async for _ in client.agenerate_stream("hello"):
+                pass
+
+    asyncio.run(attempt())
+    assert client._model.calls == 3
+
+
+def test_half_open_lets_one_probe_through(client):
+    for _ in range(3):
+        call(client)
+    time.sleep(0.25)
+    # Failed probe re-opens the breaker for another retry_after
+    assert call(client) == "error"
+    assert call(client) == "unavailable"
+    assert client._model.calls == 4
+
+    time.sleep(0.25)
+    client._model.failing = False
+    assert call(client) == "ok"
+    assert [call(client) for _ in range(3)] == ["ok"] * 3
+    assert client.available
+    assert client.health()["consecutive_failures"] == 0
+
+
+def test_concurrent_callers_share_a_single_probe(client):
+    for _ in range(3):
+        call(client)
+    time.sleep(0.25)
+    client._admit()
+    # The probe is in flight, so everyone else still fails fast
+    with pytest.raises(VertexUnavailable):
+        client._admit()
+
+
+def test_stub_model_round_trip():
+    vertex = VertexClient("test-project", stub_latency_ms=0)
+    assert vertex.generate("User query: hi") == "[stub] You asked: hi"
+
+    async def stream():
+        return "".join([chunk async for chunk in vertex.agenerate_stream("User query: hi there")])
+
+    assert asyncio.run(stream()) == "[stub] You asked: hi there"